@@ -0,0 +1,320 @@
+# Base python imports
+import math
+import multiprocessing as mp
+import os
+import random
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Extended python imports
+import numpy as np
+
+# Project imports
+from fitness import IncrementalFitness
+from main import solution_factory
+from solution import Solution
+from utils import Warehouse
+
+
+class Chain:
+    def __init__(self, warehouse: Warehouse, batt: int, seed: int, starts: int = 1):
+        """A single annealing chain over a whole solution
+
+        Moves are applied in place and undone if rejected, and their
+        effect on fitness is computed incrementally, so a step never
+        copies or rescores the solution.
+
+        Each chain keeps its own random state, so chains give the same
+        results whether they share a process or not.
+
+        :param Warehouse warehouse: The warehouse to patrol
+        :param int batt: The robots' battery life
+        :param int seed: Seeds the chain's initial solution and moves
+        :param int starts: Draw this many random solutions, and start
+            from the fittest. The random initial paths vary a lot in
+            quality, and single point moves can't reroute them.
+        """
+        saved = random.getstate()
+        random.seed(seed)
+        candidates = [solution_factory(warehouse, batt) for _ in range(starts)]
+        self.solution = max(candidates, key=lambda s: s.fitness_func())
+        self._random_state = random.getstate()
+        random.setstate(saved)
+
+        self.scorer = IncrementalFitness(self.solution.paths)
+        self.best_fitness = self.scorer.score
+        self.best_paths = [p.copy() for p in self.solution.paths]
+
+    def _propose(self) -> Tuple[int, int, Tuple[int, int], Tuple[int, int], float]:
+        """Move one point of one path, without updating the scorer
+
+        :returns: The robot, index, old and new coordinates of the move,
+            and the change in fitness it causes
+        """
+        robot = random.randrange(len(self.solution.paths))
+        index, old, new = self.solution.paths[robot].mutate()
+        return robot, index, old, new, self.scorer.delta(robot, index, old, new)
+
+    def _undo(self, robot: int, index: int, old: Tuple[int, int]) -> None:
+        self.solution.paths[robot].coord_list[index] = old
+
+    def probe(self, moves: int) -> float:
+        """Try some moves, undoing each one
+
+        :rtype: float
+        :returns: The mean fitness lost by the moves that lose fitness,
+            used to pick a starting temperature
+        """
+        random.setstate(self._random_state)
+        losses = []
+        for _ in range(moves):
+            robot, index, old, _, delta = self._propose()
+            self._undo(robot, index, old)
+            if delta < 0:
+                losses.append(-delta)
+        self._random_state = random.getstate()
+        return sum(losses) / len(losses) if losses else 1.0
+
+    def run(self, steps: int, temperature: float) -> Dict[str, float]:
+        """Anneal for a number of steps at a fixed temperature
+
+        :rtype: Dict[str, float]
+        :returns: The chain's current and best fitness, and how many of
+            the steps were accepted
+        """
+        random.setstate(self._random_state)
+        accepted = 0
+        for _ in range(steps):
+            robot, index, old, new, delta = self._propose()
+            # Metropolis criterion, for a fitness to maximize
+            if delta < 0 and random.random() >= math.exp(delta / temperature):
+                self._undo(robot, index, old)
+                continue
+
+            self.scorer.update(robot, index, old, new)
+            accepted += 1
+            if self.scorer.score > self.best_fitness:
+                self.best_fitness = self.scorer.score
+                # Copies share cell arrays until the chain moves again
+                self.best_paths = [p.copy() for p in self.solution.paths]
+        self._random_state = random.getstate()
+
+        return {"fitness": self.scorer.score, "best": self.best_fitness, "accepted": accepted}
+
+    def best_cells(self) -> List[np.ndarray]:
+        """The best solution this chain has seen, see Solution.to_cells"""
+        return [p.cells for p in self.best_paths]
+
+
+class _LocalChain:
+    """Runs a chain in this process, with the same interface as _ChainProcess"""
+
+    def __init__(self, *args):
+        self.chain = Chain(*args)
+
+    def send(self, method: str, *args) -> None:
+        self._result = getattr(self.chain, method)(*args)
+
+    def recv(self):
+        return self._result
+
+    def close(self) -> None:
+        pass
+
+
+def _chain_worker(conn, *args) -> None:
+    chain = Chain(*args)
+    while True:
+        method, args = conn.recv()
+        if method is None:
+            break
+        conn.send(getattr(chain, method)(*args))
+
+
+class _ChainProcess:
+    """Runs a chain in its own process, driven over a pipe"""
+
+    def __init__(self, *args):
+        ctx = mp.get_context()
+        self._conn, child = ctx.Pipe()
+        self._process = ctx.Process(target=_chain_worker, args=(child, *args), daemon=True)
+        self._process.start()
+
+    def send(self, method: str, *args) -> None:
+        self._conn.send((method, args))
+
+    def recv(self):
+        return self._conn.recv()
+
+    def close(self) -> None:
+        """Stop the process, without raising if it already died
+
+        close() runs while another error may be propagating, e.g. the
+        EOFError of a chain that crashed, which must not be hidden.
+        """
+        try:
+            self._conn.send((None, ()))
+        except OSError:
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+
+
+class AnnealResult(NamedTuple):
+    """The outcome of a multi-start annealing run"""
+    # The best solution found by any chain
+    solution: Solution
+    # The best fitness found by each chain, recomputed exactly
+    chain_best: List[float]
+    # Initial solutions scored and moves proposed, over every chain
+    evaluations: int
+    # Wall clock time, in seconds
+    elapsed: float
+    # The number of processes the chains ran in
+    cores: int
+
+    @property
+    def evals_per_sec_per_core(self) -> float:
+        return self.evaluations / self.elapsed / self.cores if self.elapsed > 0 else 0.0
+
+
+def anneal(
+    warehouse: Warehouse,
+    batt: int,
+    chains: int = 4,
+    steps: Optional[int] = 20000,
+    time_budget: Optional[float] = None,
+    replica_exchange: bool = True,
+    ladder_ratio: float = 1.5,
+    round_steps: int = 200,
+    acceptance: Tuple[float, float] = (0.5, 0.01),
+    starts: int = 12,
+    seed: int = 0,
+    processes: bool = True
+) -> AnnealResult:
+    """Run several simulated annealing chains over whole solutions
+
+    Chains run in rounds of round_steps moves. Between rounds:
+        * The temperature adapts so the fraction of accepted moves tracks
+          a target, which decays geometrically from acceptance[0] at the
+          start of the run to acceptance[1] at the end.
+        * With replica exchange (parallel tempering), chain k runs at
+          ladder_ratio ** k times the base temperature, and neighboring
+          chains swap temperatures with the usual Metropolis probability.
+          Otherwise every chain follows the same schedule independently.
+
+    With a step budget, results only depend on the seed, not on how the
+    chains are spread over processes.
+
+    :param Warehouse warehouse: The warehouse to patrol
+    :param int batt: The robots' battery life
+    :param int chains: The number of independent starts
+    :param int steps: Stop after this many moves per chain
+    :param float time_budget: Stop after this many seconds
+    :param bool replica_exchange: Swap temperatures between chains
+    :param float ladder_ratio: The temperature ratio between neighboring chains
+    :param Tuple[float, float] acceptance: The target acceptance rate at
+        the start and end of the run
+    :param int round_steps: Moves per chain between adaptations and exchanges
+    :param int starts: Each chain starts from the fittest of this many
+        random solutions
+    :param int seed: Seeds every chain, and the exchanges
+    :param bool processes: Run each chain in its own process
+
+    :rtype: AnnealResult
+    """
+    if steps is None and time_budget is None:
+        raise ValueError("Annealing needs a step budget, a time budget, or both")
+
+    rng = random.Random(seed)
+    runner = _ChainProcess if processes else _LocalChain
+    started = time.perf_counter()
+    workers = [runner(warehouse, batt, seed * 1_000_003 + k, starts) for k in range(chains)]
+
+    def call(method: str, *args) -> List:
+        for w in workers:
+            w.send(method, *args)
+        return [w.recv() for w in workers]
+
+    try:
+        # Start where an average losing move is accepted half the time
+        scale = sum(call("probe", 50)) / chains / math.log(2)
+        ladder = [ladder_ratio ** k if replica_exchange else 1.0 for k in range(chains)]
+        # The chain running at each rung of the ladder
+        order = list(range(chains))
+
+        done = 0
+        rounds = 0
+        while True:
+            elapsed = time.perf_counter() - started
+            progress = max(
+                done / steps if steps else 0.0,
+                elapsed / time_budget if time_budget else 0.0
+            )
+            if progress >= 1:
+                break
+            n = min(round_steps, steps - done) if steps else round_steps
+
+            temperatures = [0.0] * chains
+            for rung, k in enumerate(order):
+                temperatures[k] = scale * ladder[rung]
+            for w, t in zip(workers, temperatures):
+                w.send("run", n, t)
+            results = [w.recv() for w in workers]
+            done += n
+            rounds += 1
+
+            # Adaptive cooling
+            rate = sum(r["accepted"] for r in results) / (n * chains)
+            target = acceptance[0] * (acceptance[1] / acceptance[0]) ** progress
+            scale *= min(2.0, max(0.5, math.sqrt(target / max(rate, 1e-3))))
+
+            if replica_exchange:
+                # Alternate between even and odd pairs of rungs
+                for rung in range(rounds % 2, chains - 1, 2):
+                    a, b = order[rung], order[rung + 1]
+                    beta_a, beta_b = 1 / temperatures[a], 1 / temperatures[b]
+                    log_p = (beta_a - beta_b) * (results[b]["fitness"] - results[a]["fitness"])
+                    if log_p >= 0 or rng.random() < math.exp(log_p):
+                        order[rung], order[rung + 1] = b, a
+
+        elapsed = time.perf_counter() - started
+        best_cells = call("best_cells")
+    finally:
+        for w in workers:
+            w.close()
+
+    template = solution_factory(warehouse, batt)
+    candidates = [template.with_cells(cells) for cells in best_cells]
+    scores = [s.fitness_func() for s in candidates]
+    best = candidates[int(np.argmax(scores))]
+
+    cores = min(chains, os.cpu_count() or 1) if processes else 1
+    return AnnealResult(best, scores, (done + starts) * chains, elapsed, cores)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run multi-start simulated annealing")
+    parser.add_argument("warehouse")
+    parser.add_argument("--battery", type=int, default=30)
+    parser.add_argument("--chains", type=int, default=4)
+    parser.add_argument("--steps", type=int, default=None)
+    parser.add_argument("--time", type=float, default=None, help="Time budget, in seconds")
+    parser.add_argument("--no-exchange", action="store_true", help="Run independent chains")
+    parser.add_argument("--serial", action="store_true", help="Run every chain in this process")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    result = anneal(
+        Warehouse(args.warehouse), args.battery, args.chains,
+        args.steps if args.steps or args.time else 20000, args.time,
+        replica_exchange=not args.no_exchange, seed=args.seed,
+        processes=not args.serial
+    )
+    print(f"Best fitness: {result.solution.fitness_func()}")
+    print(f"Chain best: {result.chain_best}")
+    print(f"{result.evals_per_sec_per_core:.0f} evaluations/s per core on {result.cores} cores")
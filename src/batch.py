@@ -0,0 +1,227 @@
+# Base python imports
+import json
+import os
+import random
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Project imports
+from checkpoint import JsonLinesProgress
+from evolution import evolve, rank
+from main import generation_factory
+from path import save_multiple_paths_as_gif
+from utils import Warehouse
+import fitness
+
+
+class Job(NamedTuple):
+    """One warehouse and configuration to solve"""
+    # Used as the job's output directory name
+    name: str
+    warehouse: str
+    battery: int
+    population: int = 12
+    cycles: int = 500
+    seed: int = 0
+    # Save the best solution as path.gif
+    render: bool = False
+    # Continue from the job's checkpoint, if it has one, rather than starting over
+    resume: bool = False
+
+
+def load_manifest(file: str) -> List[Job]:
+    """Read a JSON manifest of jobs
+
+    The manifest holds a list of jobs, or {"defaults": {...}, "jobs": [...]}
+    where defaults fill in any field a job leaves out. Each job needs a
+    warehouse and a battery, see Job for the other fields. Warehouse
+    files are relative to the manifest, and jobs without a name are
+    named after their position and warehouse.
+
+    :rtype: List[Job]
+    """
+    with open(file) as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {"jobs": manifest}
+
+    root = os.path.dirname(os.path.abspath(file))
+    jobs = []
+    for i, entry in enumerate(manifest["jobs"]):
+        entry = {**manifest.get("defaults", {}), **entry}
+        unknown = set(entry) - set(Job._fields)
+        if unknown:
+            raise ValueError(f"Unknown fields in job {i}: {sorted(unknown)}. Expected {Job._fields}")
+        entry["warehouse"] = os.path.join(root, entry["warehouse"])
+        entry.setdefault("name", f"{i:03d}-{os.path.splitext(os.path.basename(entry['warehouse']))[0]}")
+        jobs.append(Job(**entry))
+
+    names = [j.name for j in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("Job names must be unique, they name the output directories")
+    return jobs
+
+
+# Set in each worker process by _init_worker
+_worker_cache_dir: Optional[str] = None
+# abspath -> (modification time, warehouse), kept for the worker's lifetime
+_worker_warehouses: Dict[str, Tuple[int, Warehouse]] = {}
+
+
+def _init_worker(cache_dir: Optional[str]) -> None:
+    global _worker_cache_dir
+    _worker_cache_dir = cache_dir
+
+
+def _warehouse(file: str) -> Tuple[Warehouse, bool]:
+    """Load a warehouse, or reuse the one this worker already loaded
+
+    Visibility tables and distance fields are cached on the Warehouse,
+    so later jobs on the same site skip that preprocessing too.
+
+    :returns: The warehouse, and whether it was already loaded
+    """
+    file = os.path.abspath(file)
+    mtime = os.stat(file).st_mtime_ns
+    cached = _worker_warehouses.get(file)
+    if cached is not None and cached[0] == mtime:
+        return cached[1], True
+    w = Warehouse(file, cache_dir=_worker_cache_dir)
+    _worker_warehouses[file] = (mtime, w)
+    return w, False
+
+
+def run_job(job: Job, output: str) -> Dict:
+    """Solve one job, writing its results to a directory
+
+    The directory gets:
+        * progress.jsonl: One record per cycle, see evolve()
+        * checkpoint.npz: Lets an interrupted job resume, if it sets
+          resume. The checkpoint records the job's battery, population,
+          robots and seed, and resuming with other settings fails.
+          Jobs that don't resume start over, replacing the checkpoint
+          and progress of any earlier run.
+        * solution.json: The best solution's fitness and paths
+        * path.gif: The best solution, if the job renders
+
+    :rtype: Dict
+    :returns: The job's entry in the batch report
+    """
+    started = time.perf_counter()
+    record = {"name": job.name, "job": job._asdict(), "output": output, "worker": os.getpid()}
+    try:
+        os.makedirs(output, exist_ok=True)
+        w, warm = _warehouse(job.warehouse)
+        evaluations = fitness.stats.solution_misses
+
+        checkpoint = os.path.join(output, "checkpoint.npz")
+        progress_file = os.path.join(output, "progress.jsonl")
+        if not job.resume:
+            for stale in (checkpoint, progress_file):
+                if os.path.exists(stale):
+                    os.remove(stale)
+        config = {"battery": job.battery, "population": job.population, "robots": len(w.bases), "seed": job.seed}
+
+        random.seed(job.seed)
+        gen = generation_factory(w, job.battery, job.population)
+        with JsonLinesProgress(progress_file) as progress:
+            gen = evolve(
+                gen, job.cycles, render=False, progress=progress,
+                checkpoint=checkpoint, checkpoint_config=config
+            )
+
+        # evolve returns the last bred generation, which isn't sorted
+        rank(gen)
+        best = gen.solutions[0]
+        with open(os.path.join(output, "solution.json"), "w") as f:
+            json.dump({
+                "fitness": best.fitness_func(),
+                "bases": [list(p.base) for p in best.paths],
+                "paths": [p.coords().tolist() for p in best.paths],
+            }, f)
+        if job.render:
+            save_multiple_paths_as_gif(10, best.paths, output=os.path.join(output, "path.gif"))
+
+        record.update({
+            "status": "ok",
+            "fitness": best.fitness_val,
+            "evaluations": fitness.stats.solution_misses - evaluations,
+            "warm_warehouse": warm,
+        })
+    except Exception as e:
+        record.update({"status": "error", "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()})
+
+    record["elapsed"] = time.perf_counter() - started
+    return record
+
+
+def run_batch(
+    jobs: List[Job],
+    output: str = "batch",
+    workers: Optional[int] = None,
+    cache_dir: Optional[str] = None
+) -> Dict:
+    """Solve many jobs over one pool of worker processes
+
+    Workers stay up for the whole batch and keep every warehouse they
+    load, so jobs on the same site share its preprocessing. The
+    costliest jobs start first, to finish the batch sooner. A job that
+    fails is reported, and doesn't stop the others.
+
+    :param List[Job] jobs: The jobs to run, see load_manifest
+    :param str output: Each job writes to output/<job name>, and the batch
+        report is written to output/report.json
+    :param int workers: The number of processes. Defaults to one per CPU.
+    :param str cache_dir: Cache parsed warehouse grids here, see Warehouse
+
+    :rtype: Dict
+    :returns: The batch report
+    """
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    started = time.perf_counter()
+
+    def cost(job: Job) -> int:
+        return job.cycles * job.population * job.battery
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_dir,)) as pool:
+        futures = {
+            job.name: pool.submit(run_job, job, os.path.join(output, job.name))
+            for job in sorted(jobs, key=cost, reverse=True)
+        }
+        results = [futures[job.name].result() for job in jobs]
+
+    report = {
+        "jobs": results,
+        "succeeded": sum(r["status"] == "ok" for r in results),
+        "failed": sum(r["status"] != "ok" for r in results),
+        "workers": workers,
+        "elapsed": time.perf_counter() - started,
+    }
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Solve every job in a manifest over one worker pool")
+    parser.add_argument("manifest", help="A JSON list of jobs, see batch.load_manifest")
+    parser.add_argument("--output", default="batch", help="Where to write job results and report.json")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-dir", help="Cache parsed warehouse grids in this directory")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume every job from its checkpoint, as if the manifest set resume")
+    args = parser.parse_args()
+
+    jobs = load_manifest(args.manifest)
+    if args.resume:
+        jobs = [job._replace(resume=True) for job in jobs]
+    report = run_batch(jobs, args.output, args.workers, args.cache_dir)
+    for r in report["jobs"]:
+        result = f"{r['fitness']:.1f}" if r["status"] == "ok" else r["error"]
+        print(f"{r['name']:>24}: {r['status']:>5} {r['elapsed']:8.2f}s {result}")
+    print(f"{report['succeeded']} succeeded, {report['failed']} failed in {report['elapsed']:.2f}s")
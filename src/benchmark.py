@@ -0,0 +1,903 @@
+# Base python imports
+import argparse
+import contextlib
+import cProfile
+import json
+import os
+import multiprocessing
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# Extended python imports
+import numpy as np
+
+# Project imports
+from annealing import anneal
+from fitness import IncrementalFitness, windowed_scores
+from floorplan import generate_warehouse
+from evolution import breed, evolve, rank
+from generation import Generation
+from instrument import Instrument, Summary
+from main import generation_factory
+from operators import CoverageCrossover, SegmentMutator
+from path import Path
+from replan import repair_generation, reseed
+from solution import Solution, evaluate_population
+from utils import Warehouse
+import fitness
+import kernels
+import parallel
+
+
+def legacy_surveyed_nodes(path: Path, point: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """The original Path.surveyedNodes: scan the square around a point
+    for free cells
+
+    Only the bounds check differs from the original, which let negative
+    indices wrap around to the far side of the grid.
+    """
+    grid = path.warehouse.occupancy_grid
+    xLoc = point[0]
+    yLoc = point[1]
+    surveyedNodes = []
+
+    for x in range(xLoc - path.vision_radius, xLoc + path.vision_radius + 1):
+        for y in range(yLoc - path.vision_radius, yLoc + path.vision_radius + 1):
+            if 0 <= x < len(grid) and 0 <= y < len(grid[0]) and not grid[x][y]:
+                surveyedNodes.append((x, y))
+    return surveyedNodes
+
+
+def legacy_surveillance_score(solution: Solution) -> int:
+    """The original, loop based Solution.surveillance_score
+
+    Kept as a reference to check the vectorized scorer against, so it
+    doesn't use the warehouse's visibility tables.
+    """
+    out = 0
+    grid = solution.paths[0].warehouse.occupancy_grid
+
+    def row(i): return [int(not b) for b in grid[i]]
+
+    time_step_map = np.array([row(i) for i in range(len(grid))])
+    time_map = np.copy(time_step_map)
+
+    for ts in range(len(solution.paths[0].coord_list)):
+        surveyed = set()
+        for path in solution.paths:
+            surveyed.update(legacy_surveyed_nodes(path, path.coord_list[ts]))
+        for y, x in surveyed:
+            out += time_map[y][x]
+            time_map[y][x] = 0
+        time_map += time_step_map
+
+    return out
+
+
+def legacy_distance_score(solution: Solution) -> float:
+    """The original, loop based Solution.distance_score"""
+    coef = 10
+    out = 0.0
+
+    for ts in range(len(solution.paths[0].coord_list)):
+        for path in solution.paths:
+            p1, p2 = path.base, path.coord_list[ts]
+            out += coef * ((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)**0.5
+
+    return out
+
+
+def legacy_path_fitness(path: Path) -> float:
+    """The original, loop based Path.fitness_func"""
+    fitness_val = 0
+    grid = path.warehouse.occupancy_grid
+    timeStepMap = np.array([[float(not b) for b in row] for row in grid])
+    timeMap = 10 * path.battery_life * timeStepMap
+    start = path.coord_list[0]
+
+    for timeStep in range(len(path.coord_list)):
+        for point in legacy_surveyed_nodes(path, path.coord_list[timeStep]):
+            fitness_val += timeMap[point[0], point[1]]
+            fitness_val += path.distance_multiplier * ((start[0] - point[0])**2 + (start[1] - point[1])**2)**0.5
+            timeMap[point[0], point[1]] = 0
+        timeMap += timeStepMap
+
+    return fitness_val
+
+
+def random_solution(w: Warehouse, batt: int, robots: int, mutations: int) -> Solution:
+    """Build a solution with one robot per base (cycling through the
+    bases if more robots are requested), then scramble it a little
+    """
+    paths = []
+    for i in range(robots):
+        path = Path(w, w.bases[i % len(w.bases)], battery_life=batt)
+        for _ in range(mutations):
+            path.mutate()
+        paths.append(path)
+    return Solution(paths)
+
+
+def cold_fitness(solution: Solution) -> float:
+    """Evaluate a solution with its fitness caches cleared"""
+    for path in solution.paths:
+        path.invalidate()
+    return solution.fitness_func()
+
+
+def cold_population_fitness(population: List[Solution]) -> List[float]:
+    """Evaluate a population in one batch, with its fitness caches cleared"""
+    for s in population:
+        for path in s.paths:
+            path.invalidate()
+    return evaluate_population(population)
+
+
+def best_time(func: Callable, repeat: int) -> float:
+    """Return the fastest of `repeat` runs of func, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_fitness(w: Warehouse, batt: int, robots: int, solutions: int, repeat: int) -> List[Tuple[str, float]]:
+    """Time the legacy and vectorized fitness functions on the same
+    population, checking that they agree on every solution
+    """
+    population = [random_solution(w, batt, robots, batt) for _ in range(solutions)]
+
+    for s in population:
+        expected = legacy_surveillance_score(s) + legacy_distance_score(s)
+        actual = s.fitness_func()
+        if expected != actual:
+            raise AssertionError(f"Fitness mismatch: legacy {expected}, vectorized {actual}")
+
+    legacy = best_time(
+        lambda: [legacy_surveillance_score(s) + legacy_distance_score(s) for s in population],
+        repeat
+    )
+    vectorized = best_time(lambda: [cold_fitness(s) for s in population], repeat)
+    batched = best_time(lambda: cold_population_fitness(population), repeat)
+
+    if cold_population_fitness(population) != [s.fitness_func() for s in population]:
+        raise AssertionError("Batched fitness does not match per-solution fitness")
+
+    return [("legacy", legacy), ("vectorized", vectorized), ("batched", batched)]
+
+
+def bench_delta(w: Warehouse, batt: int, robots: int, mutations: int) -> List[Tuple[str, float]]:
+    """Time rescoring a solution after every mutation against tracking
+    the change incrementally, checking that both end on the same fitness
+    """
+    solution = random_solution(w, batt, robots, batt)
+    moves = []
+    for _ in range(mutations):
+        robot = random.randrange(robots)
+        moves.append((robot, *solution.paths[robot].mutate()))
+
+    def replay(on_move: Callable) -> None:
+        for robot, index, old, new in moves:
+            solution.paths[robot].coord_list[index] = new
+            on_move(robot, index, old, new)
+
+    def undo() -> None:
+        for robot, index, old, new in reversed(moves):
+            solution.paths[robot].coord_list[index] = old
+
+    undo()
+    start = time.perf_counter()
+    replay(lambda *move: solution.fitness_func())
+    full = time.perf_counter() - start
+    expected = solution.fitness_func()
+
+    undo()
+    start = time.perf_counter()
+    scorer = IncrementalFitness(solution.paths)
+    replay(scorer.update)
+    incremental = time.perf_counter() - start
+
+    if abs(scorer.score - expected) > 1e-6 * abs(expected):
+        raise AssertionError(f"Fitness mismatch: full {expected}, incremental {scorer.score}")
+
+    return [("full", full / mutations), ("incremental", incremental / mutations)]
+
+
+class _LegacyPath:
+    """The original Path's state and copy: a list of coordinate tuples
+
+    Frozen here so that copy costs are measured against the original
+    classes without needing them on disk.
+    """
+
+    def __init__(
+        self,
+        warehouse: Warehouse,
+        base: Tuple[int, int],
+        battery_life: int,
+        vision_radius: int,
+        coord_list: List[Tuple[int, int]]
+    ):
+        self.warehouse = warehouse
+        self.base = base
+        self.battery_life = battery_life
+        self.coord_list = coord_list
+        self.vision_radius = vision_radius
+        self.distance_multiplier = 1
+
+    def copy(self) -> "_LegacyPath":
+        return _LegacyPath(
+            self.warehouse,
+            self.base,
+            self.battery_life,
+            self.vision_radius,
+            list(self.coord_list))
+
+
+class _LegacySolution:
+    """The original Solution's state and copy"""
+
+    def __init__(self, paths: List[_LegacyPath]):
+        self.paths = paths
+        self.fitness_val = 0
+
+    def copy(self) -> "_LegacySolution":
+        return _LegacySolution([p.copy() for p in self.paths])
+
+
+class _LegacyGeneration:
+    """The original Generation's state and copy"""
+
+    def __init__(self, solutions: List[_LegacySolution]):
+        self.solutions = solutions
+
+    def copy(self) -> "_LegacyGeneration":
+        return _LegacyGeneration([s.copy() for s in self.solutions])
+
+
+def legacy_copy_costs(population: Generation, repeat: int) -> Dict[str, float]:
+    """Measure the memory and copy time of a population with the original
+    Path, Solution and Generation classes
+
+    :param Generation population: Rebuilt, point for point, with the old classes
+    :param int repeat: Keep the best of this many copies
+
+    :rtype: Dict[str, float]
+    :returns: The population's size in bytes, and its best copy time in seconds
+    """
+    def build() -> _LegacyGeneration:
+        return _LegacyGeneration([
+            _LegacySolution([
+                _LegacyPath(p.warehouse, p.base, p.battery_life, p.vision_radius,
+                            [tuple(x) for x in p.coords().tolist()])
+                for p in s.paths
+            ])
+            for s in population.solutions
+        ])
+
+    tracemalloc.start()
+    legacy = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return {"bytes": size, "copy": best_time(legacy.copy, repeat)}
+
+
+def bench_copy(w_file: str, batt: int, robots: int, solutions: int, repeat: int) -> List[Tuple[str, float]]:
+    """Compare the memory and copy time of a population with the original
+    Path, Solution and Generation classes (lists of coordinate tuples,
+    see legacy_copy_costs) against array backed paths
+    """
+    w = Warehouse(w_file)
+    population = Generation([random_solution(w, batt, robots, batt) for _ in range(solutions)])
+    legacy = legacy_copy_costs(population, repeat)
+
+    def detached_copy() -> Generation:
+        out = population.copy()
+        for s in out.solutions:
+            for p in s.paths:
+                p.cells = p.cells
+        return out
+
+    def with_caches() -> Generation:
+        """A copy holding what a running GA caches: fitness partials,
+        which the original didn't keep, and movable points"""
+        out = detached_copy()
+        rank(out)
+        for s in out.solutions:
+            for p in s.paths:
+                p.movable_indices()
+        return out
+
+    # Build the warehouse's tables and compile the kernels beforehand
+    rank(population.copy())
+    sizes = []
+    for build in (detached_copy, with_caches):
+        tracemalloc.start()
+        out = build()
+        sizes.append(tracemalloc.get_traced_memory()[0])
+        tracemalloc.stop()
+        del out
+
+    return [
+        ("legacy bytes", legacy["bytes"]),
+        ("array bytes", sizes[0]),
+        ("cached bytes", sizes[1]),
+        ("legacy copy", legacy["copy"]),
+        ("array copy", best_time(population.copy, repeat)),
+    ]
+
+
+def bench_kernels(batt: int, robots: int, solutions: int, repeat: int) -> List[Tuple[str, float]]:
+    """Check that the compiled and NumPy kernels agree on every bundled
+    warehouse, with and without line of sight, then time both on the last one
+    """
+    if kernels.numba is None:
+        raise RuntimeError("Numba is not installed, only the NumPy kernels are available")
+
+    for name, floor, _, _ in SCENARIOS:
+        if not isinstance(floor, str):
+            continue
+        w = Warehouse(floor)
+        population = [random_solution(w, batt, robots, batt) for _ in range(solutions)]
+        cells = np.stack([np.stack([p.cells for p in s.paths]) for s in population])
+        size = w.shape[0] * w.shape[1]
+
+        for line_of_sight in (False, True):
+            table = w.visibility_table(2, line_of_sight)
+            expected = kernels.last_seen_numpy(table, cells, size)
+            if not np.array_equal(kernels.last_seen_numba(table, cells, size), expected):
+                raise AssertionError(f"last_seen mismatch on {name}")
+            expected = kernels.last_seen_by_numpy(table, cells, size)
+            if not np.array_equal(kernels.last_seen_by_numba(table, cells, size), expected):
+                raise AssertionError(f"last_seen_by mismatch on {name}")
+
+        for p in (p for s in population for p in s.paths):
+            expected = kernels.mutation_indices_numpy(p.cells, w.shape[1])
+            if not np.array_equal(kernels.mutation_indices_numba(p.cells, w.shape[1]), expected):
+                raise AssertionError(f"mutation_indices mismatch on {name}")
+
+    table = w.visibility_table(1, False)
+    paths = [p for s in population for p in s.paths]
+    return [
+        ("last_seen numpy", best_time(lambda: kernels.last_seen_numpy(table, cells, size), repeat)),
+        ("last_seen numba", best_time(lambda: kernels.last_seen_numba(table, cells, size), repeat)),
+        ("mutation_indices numpy", best_time(lambda: [kernels.mutation_indices_numpy(p.cells, w.shape[1]) for p in paths], repeat)),
+        ("mutation_indices numba", best_time(lambda: [kernels.mutation_indices_numba(p.cells, w.shape[1]) for p in paths], repeat)),
+    ]
+
+
+def bench_anneal(w: Warehouse, batt: int, chains: int, budget: float, seed: int) -> List[Tuple[str, float]]:
+    """Compare multi-start annealing against the GA on the same time budget
+
+    The GA runs in a single process, annealing runs one chain per process.
+    """
+    random.seed(seed)
+    gen = generation_factory(w, batt, 12)
+    evaluations = fitness.stats.solution_misses
+    start = time.perf_counter()
+    while time.perf_counter() - start < budget:
+        rank(gen)
+        gen = breed(gen)
+    rank(gen)
+    ga_time = time.perf_counter() - start
+    ga_evals = fitness.stats.solution_misses - evaluations
+
+    results = [
+        ("ga best", gen.solutions[0].fitness_val),
+        ("ga evals/s", ga_evals / ga_time),
+    ]
+    for exchange in (False, True):
+        out = anneal(w, batt, chains, steps=None, time_budget=budget, replica_exchange=exchange, seed=seed)
+        name = "tempering" if exchange else "multi-start"
+        results += [
+            (f"{name} best", max(out.chain_best)),
+            (f"{name} mean", sum(out.chain_best) / chains),
+            (f"{name} evals/s/core", out.evals_per_sec_per_core),
+        ]
+    return results
+
+
+def bench_operators(w: Warehouse, batt: int, solutions: int, cycles: int, seed: int) -> List[Tuple[str, float]]:
+    """Compare how many fitness evaluations the GA needs to reach the
+    same fitness with its default operators, with segment moves, and
+    with coverage-aware crossover
+
+    The default run sets the target: its best fitness after `cycles`
+    cycles. Every run is measured at the cycle it first reaches the
+    target, the default run included. The other runs stop there, or
+    after four times as many cycles if they never reach it.
+    """
+    def run(mutator, crossover, target: Optional[float]) -> Tuple[float, int, int, float]:
+        random.seed(seed)
+        gen = generation_factory(w, batt, solutions)
+        evaluations = fitness.stats.solution_misses
+        start = time.perf_counter()
+        limit = cycles if target is None else 4 * cycles
+        # (best, evaluations, cycle, seconds) each time the best improves
+        trace = []
+        for c in range(limit + 1):
+            rank(gen)
+            best = gen.solutions[0].fitness_val
+            if not trace or best > trace[-1][0]:
+                trace.append((best, fitness.stats.solution_misses - evaluations, c, time.perf_counter() - start))
+            if c == limit or (target is not None and best >= target):
+                break
+            gen = breed(gen, mutator, crossover=crossover)
+        return trace[-1]
+
+    target, *default = run(None, None, None)
+    results = [("default best", target)]
+    results += [(f"default {name}", value) for name, value in zip(("evals", "cycles", "seconds"), default)]
+
+    mutator = SegmentMutator(w)
+    configs = [
+        ("segment", mutator, None),
+        ("coverage", None, CoverageCrossover()),
+        ("both", mutator, CoverageCrossover()),
+    ]
+    for config, m, crossover in configs:
+        out = run(m, crossover, target)
+        results += [(f"{config} {name}", value) for name, value in zip(("best", "evals", "cycles", "seconds"), out)]
+    results.append(("walk cache hit rate", mutator.cache.hits / max(mutator.cache.hits + mutator.cache.misses, 1)))
+    return results
+
+
+def bench_replan(w: Warehouse, batt: int, solutions: int, cycles: int, seed: int) -> List[Tuple[str, float]]:
+    """Compare re-planning after a small change to the warehouse with
+    solving the changed warehouse from scratch
+
+    A population is evolved for `cycles` cycles, then a few cells its
+    best solution visits are blocked. A fresh solve of the changed
+    warehouse runs for `cycles` cycles and sets the target; the repaired
+    population then evolves until it matches it, or for as many cycles,
+    as is and with its worst half reseeded.
+    Also checks that the updated tables match a freshly built warehouse.
+    """
+    def run(gen: Generation, target: Optional[float]) -> Tuple[float, int, int, float]:
+        evaluations = fitness.stats.solution_misses
+        start = time.perf_counter()
+        for c in range(cycles):
+            rank(gen)
+            if target is not None and gen.solutions[0].fitness_val >= target:
+                break
+            gen = breed(gen)
+        else:
+            rank(gen)
+            c = cycles
+        return (
+            gen.solutions[0].fitness_val,
+            fitness.stats.solution_misses - evaluations,
+            c,
+            time.perf_counter() - start,
+        )
+
+    random.seed(seed)
+    w.visibility_table()
+    w.mutation_table()
+    gen = generation_factory(w, batt, solutions)
+    for _ in range(cycles):
+        rank(gen)
+        gen = breed(gen)
+    rank(gen)
+    before = gen.solutions[0].fitness_val
+
+    # Block cells the best solution relies on, away from the bases
+    visited = {int(c) for p in gen.solutions[0].paths for c in p.cells} - {p.cell_id(b) for p in gen.solutions[0].paths for b in w.bases}
+    blocked = [divmod(c, w.shape[1]) for c in random.sample(sorted(visited), 4)]
+
+    start = time.perf_counter()
+    changed = w.apply_diff(blocked)
+    w.visibility_table()
+    diff_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    fresh = Warehouse.from_grid(np.array(w.occupancy_grid), w.bases)
+    fresh.visibility_table()
+    fresh.mutation_table()
+    build_seconds = time.perf_counter() - start
+    assert (fresh.visibility_table() == w.visibility_table()).all(), "Visibility table differs after apply_diff"
+    assert (fresh.mutation_table() == w.mutation_table()).all(), "Mutation table differs after apply_diff"
+
+    start = time.perf_counter()
+    moved = repair_generation(gen)
+    repair_seconds = time.perf_counter() - start
+    free = w.free_mask().ravel()
+    for s in gen.solutions:
+        for p in s.paths:
+            p.check_is_valid()
+            assert free[p.cells].all(), "A repaired path crosses an occupied cell"
+
+    reseeded = gen.copy()
+    reseed(reseeded, 0.5)
+
+    random.seed(seed)
+    target, *cold = run(generation_factory(fresh, batt, solutions), None)
+    warm = run(gen, target)
+    mixed = run(reseeded, target)
+
+    return [
+        ("best before change", before),
+        ("cells blocked", len(changed)),
+        ("apply_diff ms", 1000 * diff_seconds),
+        ("rebuild tables ms", 1000 * build_seconds),
+        ("points repaired", moved),
+        ("repair ms", 1000 * repair_seconds),
+        ("cold best", target),
+        *[(f"cold {name}", value) for name, value in zip(("evals", "cycles", "seconds"), cold)],
+        *[(f"warm {name}", value) for name, value in zip(("best", "evals", "cycles", "seconds"), warm)],
+        *[(f"reseeded {name}", value) for name, value in zip(("best", "evals", "cycles", "seconds"), mixed)],
+    ]
+
+
+def bench_instrument(w: Warehouse, batt: int, solutions: int, cycles: int, repeat: int, seed: int) -> Tuple[Summary, float, float]:
+    """Time the GA with and without instrumentation, checking that
+    instrumenting a run doesn't change its result
+
+    :rtype: Tuple[Summary, float, float]
+    :returns:
+        * The instrumented run's records
+        * The best time of an uninstrumented and an instrumented run
+    """
+    def run(instrument: Optional[Instrument]) -> Tuple[float, float]:
+        random.seed(seed)
+        gen = generation_factory(w, batt, solutions)
+        start = time.perf_counter()
+        out = evolve(gen, cycles, render=False, progress=lambda record: None, instrument=instrument)
+        return time.perf_counter() - start, out.solutions[0].fitness_func()
+
+    plain, expected = min(run(None) for _ in range(repeat))
+    instrumented = float("inf")
+    for _ in range(repeat):
+        summary = Summary()
+        seconds, actual = run(Instrument(summary))
+        instrumented = min(instrumented, seconds)
+        if actual != expected:
+            raise AssertionError(f"Instrumented run ended on {actual}, expected {expected}")
+    return summary, plain, instrumented
+
+
+def bench_windowed(
+    w: Warehouse,
+    batt: int,
+    robots: int,
+    solutions: int,
+    window: Optional[int] = None
+) -> List[Tuple[str, float]]:
+    """Compare the time and peak memory of scoring long horizons in
+    windows against scoring every timestep at once
+
+    Robots get one of four batteries, from batt / 2 to batt. Building
+    that many long random paths is slow, so robots draw theirs from a
+    pool of four paths per battery.
+
+    :param int window: Timesteps per window. Defaults to batt / 16, since
+        the default window of windowed_scores often covers every
+        timestep of small benchmarks in one go.
+    """
+    window = window or max(1, batt // 16)
+    batteries = [batt // 2, 2 * batt // 3, 5 * batt // 6, batt]
+    base = w.bases[0]
+    pool = [[Path(w, base, battery_life=b).cells for _ in range(4)] for b in batteries]
+    cells = [[random.choice(pool[r % 4]) for r in range(robots)] for _ in range(solutions)]
+    bases = [base] * robots
+
+    def traced(window: Optional[int]) -> Tuple[np.ndarray, float, int]:
+        start = time.perf_counter()
+        tracemalloc.start()
+        scores = windowed_scores(w, cells, bases, window=window)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return scores[0] + scores[1], time.perf_counter() - start, peak
+
+    traced(window)  # Load the compiled kernels
+    windowed, windowed_time, windowed_peak = traced(window)
+    whole, whole_time, whole_peak = traced(batt)
+    if windowed.tolist() != whole.tolist():
+        raise AssertionError("Windowed scores do not match scoring every timestep at once")
+    if window < batt and windowed_peak >= whole_peak:
+        raise AssertionError(
+            f"Scoring {window} timesteps at a time peaked at {windowed_peak / 1e6:.3f}MB, "
+            f"no less than scoring all {batt} at once ({whole_peak / 1e6:.3f}MB)"
+        )
+
+    return [
+        ("window", window),
+        ("whole seconds", whole_time),
+        ("whole peak MB", whole_peak / 1e6),
+        ("windowed seconds", windowed_time),
+        ("windowed peak MB", windowed_peak / 1e6),
+    ]
+
+
+# The solver's modules, which should only need NumPy to import
+CORE_MODULES = ["utils", "fitness", "path", "solution", "generation", "evolution", "parallel"]
+# Optional or rendering dependencies, that the core should not import
+HEAVY_MODULES = ["numba", "PIL", "png", "progress"]
+
+
+def bench_startup(w: Warehouse, repeat: int) -> List[Tuple[str, float, List[str]]]:
+    """Time importing each core module in a fresh interpreter, and
+    starting a spawned worker like ProcessPoolEvaluator's, until it is
+    ready, and until it has scored a path
+
+    :rtype: List[Tuple[str, float, List[str]]]
+    :returns: For each measurement: its name, the best time in seconds,
+        and the heavy modules loaded along the way
+    """
+    results = []
+    for module in CORE_MODULES:
+        code = (
+            f"import sys, time; start = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - start); print(*[m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+        )
+        runs = [
+            subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.split("\n")
+            for _ in range(repeat)
+        ]
+        results.append((f"import {module}", min(float(r[0]) for r in runs), runs[0][1].split()))
+
+    path = Path(w, w.bases[0], battery_life=30)
+    task = (path.cells, path.base, path.vision_radius, path.line_of_sight, path.distance_metric)
+
+    def spawn(task: Optional[Tuple]) -> float:
+        start = time.perf_counter()
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(1, mp_context=ctx, initializer=parallel._init_worker, initargs=(w,)) as pool:
+            if task is None:
+                pool.submit(os.getpid).result()
+            else:
+                pool.submit(parallel._worker_partials, [task]).result()
+        return time.perf_counter() - start
+
+    results.append(("spawn worker", min(spawn(None) for _ in range(repeat)), []))
+    results.append(("first partial", min(spawn(task) for _ in range(repeat)), []))
+    return results
+
+
+# (name, warehouse file or synthetic floor size, robots, battery life)
+SCENARIOS = [
+    ("warehouse", "warehouse.txt", 4, 30),
+    ("warehouse1", "warehouse1.txt", 1, 30),
+    ("bigWarehouse", "bigWarehouse.txt", 4, 200),
+    ("synthetic-32", 32, 2, 50),
+    ("synthetic-64", 64, 4, 100),
+    ("synthetic-128", 128, 8, 200),
+    ("synthetic-256", 256, 16, 400),
+]
+
+
+def time_calls(func: Callable, calls: int, repeat: int, setup: Optional[Callable] = None) -> Dict[str, float]:
+    """Time `calls` calls of func, `repeat` times over
+
+    :rtype: Dict[str, float]
+    :returns: The best and mean time of a single call, in seconds
+    """
+    totals = []
+    for _ in range(repeat):
+        total = 0.0
+        for _ in range(calls):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            total += time.perf_counter() - start
+        totals.append(total / calls)
+    return {"calls": calls, "best": min(totals), "mean": sum(totals) / len(totals)}
+
+
+def run_scenario(
+    name: str,
+    floor: Union[str, int],
+    robots: int,
+    batt: int,
+    solutions: int,
+    cycles: int,
+    repeat: int
+) -> Dict:
+    """Time each hot path of the GA on one warehouse configuration"""
+    if isinstance(floor, str):
+        w = Warehouse(floor)
+    else:
+        w = generate_warehouse(floor, floor, bases=robots, rack_density=0.9, seed=floor)
+    gen = Generation([random_solution(w, batt, robots, batt) for _ in range(solutions)])
+    paths = [p for s in gen.solutions for p in s.paths]
+
+    def cold(target) -> Callable:
+        """Clear the fitness caches of a solution or path"""
+        return lambda: [p.invalidate() for p in getattr(target, "paths", [target])]
+
+    timings = {
+        "solution_fitness": time_calls(gen.solutions[0].fitness_func, solutions, repeat, cold(gen.solutions[0])),
+        "path_fitness": time_calls(paths[0].fitness_func, 3, repeat, cold(paths[0])),
+        "path_mutate": time_calls(lambda: random.choice(paths).mutate(), 1000, repeat),
+        "crossover": time_calls(gen.crossover, 1000, repeat),
+        "generation_copy": time_calls(gen.copy, 100, repeat),
+    }
+
+    cycle = time_calls(lambda: evolve(gen, cycles, render=False), 1, repeat)
+    timings["evolve_cycle"] = {
+        "calls": cycles,
+        "best": cycle["best"] / cycles,
+        "mean": cycle["mean"] / cycles,
+    }
+
+    h, width = w.shape
+    return {
+        "name": name,
+        "warehouse": floor if isinstance(floor, str) else f"synthetic {floor}x{floor}",
+        "shape": [h, width],
+        "free_cells": int(w.free_mask().sum()),
+        "robots": robots,
+        "battery": batt,
+        "solutions": solutions,
+        "timings": timings,
+    }
+
+
+def run_suite(args: argparse.Namespace) -> Dict:
+    """Run every selected scenario, optionally under cProfile"""
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+
+    results = []
+    for name, floor, robots, batt in SCENARIOS:
+        if args.scenarios and name not in args.scenarios:
+            continue
+        random.seed(args.seed)
+
+        profiler = cProfile.Profile() if args.profile else None
+        if profiler:
+            profiler.enable()
+
+        # The GA prints its progress, keep stdout for the report
+        with contextlib.redirect_stdout(sys.stderr):
+            results.append(run_scenario(name, floor, robots, batt, args.solutions, args.cycles, args.repeat))
+
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(args.profile, f"{name}.prof"))
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "scenarios": results,
+    }
+
+
+def compare(report: Dict, baseline: Dict) -> None:
+    """Print how each best time changed relative to a baseline report"""
+    old = {s["name"]: s["timings"] for s in baseline["scenarios"]}
+    for scenario in report["scenarios"]:
+        for metric, timing in scenario["timings"].items():
+            before = old.get(scenario["name"], {}).get(metric)
+            if before:
+                ratio = timing["best"] / before["best"]
+                print(f"{scenario['name']:>16} {metric:>18}: {ratio:6.2f}x baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the GA and annealing hot paths")
+    parser.add_argument("--mode", choices=["suite", "fitness", "delta", "copy", "kernels", "anneal", "operators", "instrument", "windowed", "startup", "replan"], default="fitness")
+    parser.add_argument("--warehouse", default="bigWarehouse.txt")
+    parser.add_argument("--battery", type=int, default=200)
+    parser.add_argument("--robots", type=int, default=4)
+    parser.add_argument("--solutions", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mutations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cycles", type=int, default=10,
+                        help="suite: evolve cycles to time per scenario, "
+                             "operators: cycles of the default run, "
+                             "replan: cycles of each solve, "
+                             "instrument: cycles to evolve")
+    parser.add_argument("--scenarios", nargs="*", choices=[s[0] for s in SCENARIOS],
+                        help="suite: only run these scenarios")
+    parser.add_argument("--output", help="suite: write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="suite: a previous JSON report to compare against")
+    parser.add_argument("--chains", type=int, default=4,
+                        help="anneal: annealing chains, one process each")
+    parser.add_argument("--budget", type=float, default=10.0,
+                        help="anneal: seconds given to both the GA and annealing")
+    parser.add_argument("--window", type=int, default=None,
+                        help="windowed: timesteps per window, defaults to battery / 16")
+    parser.add_argument("--profile", help="suite: dump a cProfile .prof file per scenario into this directory")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+
+    if args.mode == "suite":
+        report = run_suite(args)
+        if args.compare:
+            with open(args.compare) as f:
+                compare(report, json.load(f))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+        else:
+            print(json.dumps(report, indent=2))
+
+    elif args.mode == "kernels":
+        results = bench_kernels(args.battery, args.robots, args.solutions, args.repeat)
+        for name, seconds in results:
+            print(f"{name:>24}: {seconds * 1000:9.3f} ms per generation")
+        print("Compiled and NumPy kernels agree on every bundled warehouse")
+
+    elif args.mode == "anneal":
+        w = Warehouse(args.warehouse)
+        with contextlib.redirect_stdout(sys.stderr):
+            results = bench_anneal(w, args.battery, args.chains, args.budget, args.seed)
+        for name, value in results:
+            print(f"{name:>24}: {value:12.1f}")
+
+    elif args.mode == "operators":
+        w = Warehouse(args.warehouse)
+        results = dict(bench_operators(w, args.battery, args.solutions, args.cycles, args.seed))
+        for name, value in results.items():
+            print(f"{name:>24}: {value:12.6g}")
+        for config in ("segment", "coverage", "both"):
+            if results[f"{config} best"] < results["default best"]:
+                print(f"{config:>24}: never reached the default run's best")
+                continue
+            ratio = results["default evals"] / results[f"{config} evals"]
+            print(f"{config:>24}: {ratio:9.2f}x fewer evaluations to first reach the same fitness")
+
+    elif args.mode == "replan":
+        w = Warehouse(args.warehouse)
+        results = dict(bench_replan(w, args.battery, args.solutions, args.cycles, args.seed))
+        for name, value in results.items():
+            print(f"{name:>24}: {value:12.6g}")
+        for config in ("warm", "reseeded"):
+            print(f"{config:>24}: {results[f'{config} evals'] / results['cold evals']:9.3f} of the evaluations, "
+                  f"{results[f'{config} seconds'] / results['cold seconds']:.3f} of the time of a full solve")
+
+    elif args.mode == "instrument":
+        w = Warehouse(args.warehouse)
+        summary, plain, instrumented = bench_instrument(
+            w, args.battery, args.solutions, args.cycles, args.repeat, args.seed
+        )
+        summary.report()
+        print(f"{'overhead':>16}: {100 * (instrumented / plain - 1):+9.1f}%")
+
+    elif args.mode == "windowed":
+        w = Warehouse(args.warehouse)
+        results = bench_windowed(w, args.battery, args.robots, args.solutions, args.window)
+        for name, value in results:
+            print(f"{name:>24}: {value:12.3f}")
+
+    elif args.mode == "startup":
+        w = Warehouse(args.warehouse)
+        for name, seconds, loaded in bench_startup(w, args.repeat):
+            print(f"{name:>20}: {seconds * 1000:9.1f} ms {' '.join(loaded)}")
+
+    elif args.mode == "copy":
+        results = bench_copy(args.warehouse, args.battery, args.robots, args.solutions, args.repeat)
+        for name, value in results:
+            print(f"{name:>12}: {value:12.6g}")
+        results = dict(results)
+        print(f"{'memory':>12}: {results['legacy bytes'] / results['array bytes']:9.1f}x smaller, "
+              f"{results['legacy bytes'] / results['cached bytes']:.1f}x with fitness and movable point caches")
+        print(f"{'copy':>12}: {results['legacy copy'] / results['array copy']:9.1f}x faster")
+
+    else:
+        w = Warehouse(args.warehouse)
+        if args.mode == "fitness":
+            results = bench_fitness(w, args.battery, args.robots, args.solutions, args.repeat)
+            unit = "generation"
+        else:
+            results = bench_delta(w, args.battery, args.robots, args.mutations)
+            unit = "mutation"
+
+        for name, seconds in results:
+            print(f"{name:>12}: {seconds * 1000:9.3f} ms per {unit}")
+        for name, seconds in results[1:]:
+            print(f"{'speedup':>12}: {results[0][1] / seconds:9.1f}x ({name})")
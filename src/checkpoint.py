@@ -0,0 +1,159 @@
+# Base python imports
+import json
+import os
+import random
+from typing import IO, Dict, Optional, Tuple, Union
+
+# Extended python imports
+import numpy as np
+
+# Project imports
+from generation import Generation
+from path import Path
+from solution import Solution
+from utils import Warehouse
+
+# Bumped whenever the layout of checkpoint files changes
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(file: str, gen: Generation, cycle: int, config: Optional[Dict] = None) -> None:
+    """Save a generation, the random number generator's state and the
+    cycle counter to a compressed .npz file
+
+    The file is written next to its destination, then renamed into
+    place, so a run killed mid-write leaves the previous checkpoint intact.
+
+    :param str file: Where to save the checkpoint
+    :param Generation gen: The generation about to be evolved at cycle
+    :param int cycle: The number of cycles already run
+    :param Dict config: The settings the run was started with, e.g. its
+        battery life and seed, as JSON. load_checkpoint refuses to resume
+        the run with different settings.
+    """
+    paths = [p for s in gen.solutions for p in s.paths]
+    warehouse = paths[0].warehouse
+    version, mt_state, gauss = random.getstate()
+
+    arrays = {
+        "version": np.array(CHECKPOINT_VERSION),
+        "warehouse_hash": np.array(warehouse.hash),
+        "cycle": np.array(cycle),
+        "robots": np.array([len(s.paths) for s in gen.solutions], dtype=np.int32),
+        "lengths": np.array([len(p.cells) for p in paths], dtype=np.int32),
+        "cells": np.concatenate([p.cells for p in paths]),
+        # The order of each path's movable points decides which one a
+        # mutation picks, so it is saved to resume exactly
+        "movable_lengths": np.array([len(p.movable_indices()) for p in paths], dtype=np.int32),
+        "movable": np.concatenate([np.array(p.movable_indices().items, dtype=np.int32) for p in paths]),
+        "bases": np.array([p.base for p in paths], dtype=np.int32).reshape(-1, 2),
+        "battery_life": np.array([p.battery_life for p in paths], dtype=np.int32),
+        "vision_radius": np.array([p.vision_radius for p in paths], dtype=np.int32),
+        "line_of_sight": np.array([p.line_of_sight for p in paths], dtype=bool),
+        "distance_metric": np.array([p.distance_metric for p in paths]),
+        "distance_multiplier": np.array([p.distance_multiplier for p in paths], dtype=np.float64),
+        "rng_version": np.array(version),
+        "rng_state": np.array(mt_state, dtype=np.uint64),
+        "rng_gauss": np.array(np.nan if gauss is None else gauss),
+        "config": np.array(json.dumps(config, sort_keys=True)),
+    }
+
+    directory = os.path.dirname(os.path.abspath(file))
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{file}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp, file)
+
+
+def load_checkpoint(
+    file: str,
+    warehouse: Warehouse,
+    restore_random: bool = True,
+    config: Optional[Dict] = None
+) -> Tuple[Generation, int]:
+    """Load a generation saved by save_checkpoint
+
+    :param str file: The checkpoint to load
+    :param Warehouse warehouse: The warehouse the checkpoint was saved in.
+        Must have the same layout and bases.
+    :param bool restore_random: Also restore the random number generator,
+        so the run continues exactly as if it had never stopped
+    :param Dict config: If set, the settings the checkpoint must have been
+        saved with, see save_checkpoint
+
+    :rtype: Tuple[Generation, int]
+    :returns:
+        * The saved generation
+        * The number of cycles already run
+    """
+    with np.load(file) as data:
+        if int(data["version"]) != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version: {int(data['version'])}")
+        if str(data["warehouse_hash"]) != warehouse.hash:
+            raise ValueError(f"Checkpoint {file} was saved in a different warehouse")
+        if config is not None:
+            saved = json.loads(str(data["config"])) if "config" in data else None
+            if saved != json.loads(json.dumps(config)):
+                raise ValueError(f"Checkpoint {file} was saved with different settings: {saved}, expected {config}")
+
+        cells = np.split(data["cells"], np.cumsum(data["lengths"])[:-1])
+        movable = [None] * len(cells)
+        if "movable" in data:
+            movable = np.split(data["movable"], np.cumsum(data["movable_lengths"])[:-1])
+        paths = []
+        for i, c in enumerate(cells):
+            path = Path(
+                warehouse,
+                tuple(int(x) for x in data["bases"][i]),
+                int(data["battery_life"][i]),
+                int(data["vision_radius"][i]),
+                [tuple(int(x) for x in data["bases"][i])],
+                bool(data["line_of_sight"][i]),
+                str(data["distance_metric"][i]),
+            )
+            path.cells = c
+            if movable[i] is not None:
+                path.restore_movable(movable[i].tolist())
+            path.distance_multiplier = float(data["distance_multiplier"][i])
+            paths.append(path)
+
+        solutions = []
+        for robots in data["robots"].tolist():
+            solutions.append(Solution(paths[:robots]))
+            paths = paths[robots:]
+
+        if restore_random:
+            gauss = float(data["rng_gauss"])
+            random.setstate((
+                int(data["rng_version"]),
+                tuple(int(x) for x in data["rng_state"]),
+                None if np.isnan(gauss) else gauss,
+            ))
+
+        return Generation(solutions), int(data["cycle"])
+
+
+class JsonLinesProgress:
+    def __init__(self, output: Union[str, IO[str]]):
+        """Write one JSON record per line, flushing after each one so
+        the stream can be followed while a run is in progress (e.g. with tail -f)
+
+        :param output: A file name to append to, or an open text stream
+        """
+        self._owned = isinstance(output, str)
+        self.stream: IO[str] = open(output, "a") if self._owned else output
+
+    def __call__(self, record: Dict) -> None:
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+    def close(self) -> None:
+        if self._owned:
+            self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,45 +1,166 @@
 # Base python imports
-from path import save_multiple_paths_as_gif
-from typing import List
+from path import Path, save_multiple_paths_as_gif
+from typing import Callable, Dict, List, Optional
+import os
 import random
+import time
 
 # Project imports
+from checkpoint import load_checkpoint, save_checkpoint
 from generation import Generation
+from instrument import NULL_INSTRUMENT, Instrument
+from parallel import SerialEvaluator
+import fitness
+
+def evolve(
+    gen1: Generation,
+    cycles: int = 40,
+    evaluator: Optional[SerialEvaluator] = None,
+    render: bool = True,
+    checkpoint: Optional[str] = None,
+    checkpoint_interval: int = 10,
+    progress: Optional[Callable[[Dict], None]] = None,
+    mutator: Optional[Callable[[Path], object]] = None,
+    instrument: Optional[Instrument] = None,
+    crossover: Optional[Callable[[Generation, int, int], None]] = None,
+    checkpoint_config: Optional[Dict] = None
+):
+    """Given an initial generation and number of cycles, evolve!
+
+    :param Generation gen1: The initial generation
+    :param int cycles: How many rounds of selection, crossover and mutation to run
+    :param SerialEvaluator evaluator: How to score each generation. Pass a
+        ProcessPoolEvaluator to score solutions in parallel. Defaults to serial.
+    :param bool render: Save the best solution to path.gif when done
+    :param str checkpoint: Save the generation, random state and cycle
+        counter to this .npz file every checkpoint_interval cycles, and when
+        done. If the file already exists, gen1 is ignored and the run resumes
+        from it.
+    :param int checkpoint_interval: How many cycles to run between checkpoints
+    :param progress: Called with a record of every cycle: its best and mean
+        fitness, fitness evaluations, evaluations per second and duration.
+        Pass a checkpoint.JsonLinesProgress to stream records to a file.
+        Defaults to printing the best fitness every 10 cycles.
+    :param mutator: How to mutate paths, e.g. an operators.SegmentMutator.
+        Defaults to Path.mutate.
+    :param Instrument instrument: Time each phase of every cycle (fitness,
+        sort, copy, crossover, mutate, checkpoint) and count evaluations,
+        cache hits and the net change in memory blocks, see instrument.py.
+        Rendering is recorded after the last cycle, as cycle number `cycles`.
+    :param crossover: How to cross over solutions, e.g. an
+        operators.CoverageCrossover. Defaults to Generation.crossover.
+    :param Dict checkpoint_config: The run's settings, saved in the
+        checkpoint. An existing checkpoint saved with other settings is
+        not resumed, and raises ValueError.
+    """
+    evaluator = evaluator or SerialEvaluator()
+    instrument = instrument or NULL_INSTRUMENT
 
-def evolve(gen1: Generation, cycles: int = 40):
-    """Given an initial generation and number of cycles, evolve!"""
     # Establish working generation
-    curr = gen1.copy()
-    num_solutions = len(gen1.solutions)
+    start = 0
+    if checkpoint and os.path.exists(checkpoint):
+        curr, start = load_checkpoint(
+            checkpoint, gen1.solutions[0].paths[0].warehouse, config=checkpoint_config
+        )
+    else:
+        curr = gen1.copy()
+
+    for c in range(start, cycles):
+        started = time.perf_counter()
+        evaluations = fitness.stats.solution_misses
+
+        # Score, then sort solutions from best to worst
+        rank(curr, evaluator, instrument)
+        scores = [s.fitness_val for s in curr.solutions]
+        evaluations = fitness.stats.solution_misses - evaluations
+        if progress is None and c % 10 == 0:
+            print(f"Evolution fitnesses: {scores[0]}")
+
+        curr = breed(curr, mutator, instrument, crossover)
+
+        if progress is not None:
+            elapsed = time.perf_counter() - started
+            progress({
+                "cycle": c,
+                "best": scores[0],
+                "mean": sum(scores) / len(scores),
+                "evaluations": evaluations,
+                "evals_per_sec": evaluations / elapsed if elapsed > 0 else 0.0,
+                "cycle_time": elapsed,
+            })
+        if checkpoint and ((c + 1) % checkpoint_interval == 0 or c + 1 == cycles):
+            with instrument.phase("checkpoint"):
+                save_checkpoint(checkpoint, curr, c + 1, checkpoint_config)
+        instrument.end_cycle(c)
+    
+    if render:
+        with instrument.phase("render"):
+            save_multiple_paths_as_gif(10, curr.solutions[0].paths)
+        instrument.end_cycle(cycles)
+    return curr
+
 
-    for c in range(cycles):
-        # Sort solutions from best to worst
-        curr.solutions.sort(key=lambda x : x.fitness_func(), reverse=True)
-        if (c % 10 == 0): print(curr)
 
-        # Select top half of solutions, insert them each twice, make a new generation
-        best = []
-        n = int(num_solutions / 2)
 
+def rank(
+    gen: Generation,
+    evaluator: Optional[SerialEvaluator] = None,
+    instrument: Instrument = NULL_INSTRUMENT
+) -> None:
+    """Score a generation and sort its solutions from best to worst"""
+    with instrument.phase("fitness"):
+        (evaluator or SerialEvaluator()).evaluate(gen.solutions)
+    with instrument.phase("sort"):
+        gen.solutions.sort(key=lambda x : x.fitness_func(), reverse=True)
+
+
+def breed(
+    curr: Generation,
+    mutator: Optional[Callable[[Path], object]] = None,
+    instrument: Instrument = NULL_INSTRUMENT,
+    crossover: Optional[Callable[[Generation, int, int], None]] = None
+) -> Generation:
+    """Build the next generation from a ranked one
+
+    :param Generation curr: A generation sorted from best to worst, see rank()
+    :param mutator: How to mutate paths, see Generation.mutate
+    :param Instrument instrument: Times the copy, crossover and mutate phases
+    :param crossover: Called with the generation and the indices of two
+        solutions to cross over in place. Defaults to Generation.crossover.
+    :rtype: Generation
+    :returns: The next, unsorted, generation
+    """
+    num_solutions = len(curr.solutions)
+
+    # Select top half of solutions, insert them each twice, make a new generation
+    best = []
+    n = int(num_solutions / 2)
+
+    with instrument.phase("copy"):
         for i in range(n):
             best.append(curr.solutions[i].copy())
         for i in range(n):
             best.append(curr.solutions[i].copy())
         if (n % 2): best.append(curr.solutions[0])
 
-        curr = Generation(best)
+    curr = Generation(best)
+    instrument.count("copies", 2 * n)
 
-        # Crossover - only crossover the last half, 
-        # keep the best solutions untouched
+    # Crossover - only crossover the last half, 
+    # keep the best solutions untouched
+    with instrument.phase("crossover"):
         for i in range(len(curr.solutions)): # arbitrary
             u, v = random.choices(range(n, num_solutions), k=2)
-            curr.crossover(u, v)
+            if crossover is None:
+                curr.crossover(u, v)
+            else:
+                crossover(curr, u, v)
+    instrument.count("crossovers", len(curr.solutions))
 
-        # Mutate - all
+    # Mutate - all
+    with instrument.phase("mutate"):
         for i in range(len(curr.solutions) * 4): # arbitrary
-            curr.mutate()
-    
-    save_multiple_paths_as_gif(10, curr.solutions[0].paths)
-    return curr
-
+            curr.mutate(mutator)
+    instrument.count("mutations", len(curr.solutions) * 4)
 
+    return curr
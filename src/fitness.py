@@ -0,0 +1,501 @@
+# Base python imports
+from bisect import bisect_left, insort
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Extended python imports
+import numpy as np
+
+# Project imports
+from utils import Warehouse
+import kernels
+
+if TYPE_CHECKING:
+    from path import Path
+
+
+def surveyed_cells(
+    warehouse: Warehouse,
+    cells: np.ndarray,
+    vision_radius: int = 1,
+    line_of_sight: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Get every cell seen along a path, and when it was seen
+
+    :param Warehouse warehouse: The warehouse the path lives in
+    :param np.ndarray cells: The flat (row * width + col) id of each point on the path
+    :param int vision_radius: How far the robot can see
+    :param bool line_of_sight: Whether occupied space blocks the robot's view
+
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    :returns:
+        * The id of each visible cell
+        * The timestep at which each of those cells was seen
+    """
+    seen = warehouse.visibility_table(vision_radius, line_of_sight)[cells]
+    times = np.broadcast_to(np.arange(len(cells))[:, None], seen.shape)
+
+    visible = seen >= 0
+    return seen[visible], times[visible]
+
+
+class PathPartial(NamedTuple):
+    """The parts of a solution's fitness that depend on a single path"""
+    # Flat ids of every cell the path sees, each listed once
+    cells: np.ndarray
+    # The last timestep each of those cells is seen at
+    last_seen: np.ndarray
+    # The distance between the robot and its base, at every timestep
+    distances: np.ndarray
+
+
+class Contributions(NamedTuple):
+    """Each robot's share of its solution's fitness
+
+    Every cell's surveillance points go to the robot that saw it last,
+    so shares add up to the solution's surveillance score.
+    """
+    # How many cells each robot was the last to see
+    cells: np.ndarray
+    # The surveillance points each robot collected from those cells
+    staleness: np.ndarray
+    # The distance score each robot earned
+    distance: np.ndarray
+
+
+class CacheStats:
+    """Hit and miss counters for the Path and Solution fitness caches"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.path_hits = 0
+        self.path_misses = 0
+        self.solution_hits = 0
+        self.solution_misses = 0
+
+    def __repr__(self):
+        return (
+            f"CacheStats(path_hits={self.path_hits}, path_misses={self.path_misses}, "
+            f"solution_hits={self.solution_hits}, solution_misses={self.solution_misses})"
+        )
+
+
+# Shared by every Path and Solution
+stats = CacheStats()
+
+
+def path_partial(path: "Path") -> PathPartial:
+    """Compute a path's contribution to its solution's fitness
+
+    Prefer Path.partial(), which caches the result.
+    """
+    return cells_partial(
+        path.warehouse,
+        path.cells,
+        path.base,
+        path.vision_radius,
+        path.line_of_sight,
+        path.distance_metric
+    )
+
+
+def cells_partial(
+    warehouse: Warehouse,
+    cells: np.ndarray,
+    base: Tuple[int, int],
+    vision_radius: int = 1,
+    line_of_sight: bool = False,
+    distance_metric: str = "euclidean"
+) -> PathPartial:
+    """Compute a path's contribution to its solution's fitness, given
+    its cell id array rather than the Path itself
+    """
+    h, w = warehouse.shape
+    table = warehouse.visibility_table(vision_radius, line_of_sight)
+    latest = kernels.last_seen(table, np.asarray(cells)[None, None], h * w)[0]
+    seen = np.flatnonzero(latest >= 0)
+
+    distances = warehouse.distance_field(base, distance_metric).ravel()[cells]
+    return PathPartial(seen, latest[seen], distances.astype(np.float64))
+
+
+def surveillance_score(partials: List[PathPartial]) -> int:
+    """Vectorized equivalent of the original Solution.surveillance_score
+
+    Every free cell accumulates one point per timestep, and a robot
+    looking at a cell collects everything it has accumulated. The
+    points collected from one cell therefore telescope into the last
+    timestep it was seen at, plus one, so only the last visit time of
+    each cell needs to be tracked.
+
+    :param List[PathPartial] partials: The partial results of every path
+    """
+    if len(partials) == 1:
+        return int((partials[0].last_seen + 1).sum())
+
+    # Cell ids are sorted within each partial, so the largest id
+    # bounds the scratch array
+    size = max((int(p.cells[-1]) + 1 for p in partials if len(p.cells)), default=0)
+    latest = np.full(size, -1, dtype=np.int64)
+    for p in partials:
+        latest[p.cells] = np.maximum(latest[p.cells], p.last_seen)
+    seen = latest[latest >= 0]
+    return int((seen + 1).sum())
+
+
+def distance_score(partials: List[PathPartial], coef: int = 10) -> float:
+    """Vectorized equivalent of the original Solution.distance_score
+
+    Terms are summed in the same (timestep, then robot) order as the
+    original loop so that the floating point result is identical.
+    Robots whose paths are shorter drop out once their path ends.
+
+    :param List[PathPartial] partials: The partial results of every path
+    :param int coef: Weight applied to every distance
+    """
+    lengths = [len(p.distances) for p in partials]
+    if len(set(lengths)) > 1:
+        terms = np.zeros((len(partials), max(lengths)))
+        running = np.arange(max(lengths))[None, :] < np.array(lengths)[:, None]
+        for row, p in zip(terms, partials):
+            row[:len(p.distances)] = p.distances
+        terms = coef * terms.T[running.T]
+        return float(np.add.accumulate(terms)[-1])
+
+    terms = coef * np.stack([p.distances for p in partials])
+    if terms.size == 0:
+        return 0.0
+
+    # Sequential accumulation in (timestep, robot) order
+    return float(np.add.accumulate(terms.T.ravel())[-1])
+
+
+def partial_contributions(partials: List[PathPartial], coef: int = 10) -> Contributions:
+    """Split a solution's fitness between its robots, see Contributions
+
+    Matches the contributions windowed_scores computes alongside fitness.
+
+    :param List[PathPartial] partials: The partial results of every path
+    :param int coef: Weight applied to every distance
+    """
+    robots = len(partials)
+    bits = kernels.robot_bits(robots)
+    size = max((int(p.cells[-1]) + 1 for p in partials if len(p.cells)), default=0)
+    latest = np.full(size, -1, dtype=np.int64)
+    for r, p in enumerate(partials):
+        # Each partial lists a cell once, so plain indexing is enough
+        latest[p.cells] = np.maximum(latest[p.cells], (p.last_seen << bits) | r)
+
+    seen = latest[latest >= 0]
+    owners = seen & ((1 << bits) - 1)
+    return Contributions(
+        np.bincount(owners, minlength=robots),
+        np.bincount(owners, (seen >> bits) + 1, robots).astype(np.int64),
+        np.array([coef * p.distances.sum() for p in partials]),
+    )
+
+
+# How many (solution, robot, timestep) points windowed_scores scores at
+# once, bounding its memory use
+WINDOW_POINTS = 1 << 20
+
+
+def population_scores(
+    warehouse: Warehouse,
+    cells: np.ndarray,
+    bases: List[Tuple[int, int]],
+    vision_radius: int = 1,
+    line_of_sight: bool = False,
+    distance_metric: str = "euclidean",
+    coef: int = 10
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Score a whole population of solutions in one vectorized pass
+
+    Every solution must have the same robots, with the same bases,
+    and every path must be the same length. Results are identical to
+    surveillance_score and distance_score on each solution's partials.
+
+    :param Warehouse warehouse: The warehouse every solution lives in
+    :param np.ndarray cells: A (solutions, robots, timesteps) array of cell ids
+    :param List[Tuple[int, int]] bases: The base of each robot
+    :param int coef: Weight applied to every distance
+
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    :returns:
+        * The surveillance score of each solution
+        * The distance score of each solution
+    """
+    surveillance, distance, _ = windowed_scores(
+        warehouse, cells, bases, vision_radius, line_of_sight, distance_metric, coef
+    )
+    return surveillance, distance
+
+
+def windowed_scores(
+    warehouse: Warehouse,
+    cells: Sequence[Sequence[np.ndarray]],
+    bases: List[Tuple[int, int]],
+    vision_radius: int = 1,
+    line_of_sight: bool = False,
+    distance_metric: str = "euclidean",
+    coef: int = 10,
+    window: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray, Contributions]:
+    """Score a population of solutions one window of timesteps at a time
+
+    Memory grows with the size of the warehouse and of a window, not
+    with the number of timesteps. Robots may have different battery
+    lives: a robot stops seeing cells, and moving away from its base,
+    once its path ends. Robot r must have the same battery life in every
+    solution. Results are identical to surveillance_score and
+    distance_score on each solution's partials.
+
+    :param Warehouse warehouse: The warehouse every solution lives in
+    :param cells: cells[s][r] is the cell id array of robot r in solution s,
+        e.g. a (solutions, robots, timesteps) array or nested lists
+    :param List[Tuple[int, int]] bases: The base of each robot
+    :param int coef: Weight applied to every distance
+    :param int window: Timesteps per window. Defaults to as many as keep
+        a window under WINDOW_POINTS points.
+
+    :rtype: Tuple[np.ndarray, np.ndarray, Contributions]
+    :returns:
+        * The surveillance score of each solution
+        * The distance score of each solution
+        * Each robot's share of those scores, as (solutions, robots) arrays
+    """
+    pop, robots = len(cells), len(bases)
+    lengths = [len(c) for c in cells[0]] if pop else []
+    horizon = max(lengths, default=0)
+    window = window or max(1, WINDOW_POINTS // max(pop * robots, 1))
+
+    size = warehouse.shape[0] * warehouse.shape[1]
+    table = warehouse.visibility_table(vision_radius, line_of_sight)
+    fields = {b: warehouse.distance_field(b, distance_metric).ravel() for b in set(bases)}
+
+    # The last timestep and robot each cell was seen at, see kernels.last_seen_by
+    bits = kernels.robot_bits(robots)
+    latest = np.full((pop, size), -1, dtype=np.int64)
+    distance = np.zeros(pop)
+    robot_distance = np.zeros((pop, robots))
+    for start in range(0, horizon, window):
+        end = min(start + window, horizon)
+
+        # Group the robots still running by how much of the window they cover
+        spans: Dict[int, List[int]] = {}
+        for r, n in enumerate(lengths):
+            if n > start:
+                spans.setdefault(min(n, end) - start, []).append(r)
+
+        terms = np.zeros((pop, end - start, robots))
+        running = np.zeros((end - start, robots), dtype=bool)
+        for span, group in spans.items():
+            chunk = np.stack([np.stack([c[r][start:start + span] for r in group]) for c in cells])
+            seen = kernels.last_seen_by(table, chunk, size)
+            if start > 0 or len(group) < robots:
+                # Renumber the group's robots and timesteps to the whole
+                # solution's. Later windows only hold later timesteps, and
+                # robot groups may overlap.
+                visible = seen >= 0
+                keys = seen[visible]
+                local_bits = kernels.robot_bits(len(group))
+                steps = (keys >> local_bits) + start
+                seen[visible] = (steps << bits) | np.asarray(group)[keys & ((1 << local_bits) - 1)]
+            np.maximum(latest, seen, out=latest)
+
+            for i, r in enumerate(group):
+                terms[:, :span, r] = fields[bases[r]][chunk[:, i]]
+            running[:span, group] = True
+
+        robot_distance += coef * terms.sum(axis=1)
+        # Sequential accumulation in (timestep, robot) order, as in
+        # distance_score, carrying the sum over from the last window
+        terms = np.concatenate([distance[:, None], coef * terms[:, running]], axis=1)
+        distance = np.add.accumulate(terms, axis=1)[:, -1]
+
+    seen = latest >= 0
+    keys = latest[seen]
+    rows = np.nonzero(seen)[0]
+    points = (keys >> bits) + 1
+    surveillance = np.bincount(rows, points, pop).astype(np.int64)
+
+    slots = rows * robots + (keys & ((1 << bits) - 1))
+    contributions = Contributions(
+        np.bincount(slots, minlength=pop * robots).reshape(pop, robots),
+        np.bincount(slots, points, pop * robots).astype(np.int64).reshape(pop, robots),
+        robot_distance,
+    )
+    return surveillance, distance, contributions
+
+
+class IncrementalFitness:
+    def __init__(self, paths: List["Path"], coef: int = 10):
+        """Track a solution's fitness under single point mutations
+
+        Per-cell visit timelines are kept for every path, so the change
+        in fitness caused by moving one point of one path costs time
+        proportional to the number of cells that point can see, rather
+        than to battery_life * robots.
+
+        Matches Solution.fitness_func, up to floating point rounding
+        in the distance term.
+
+        :param List[Path] paths: The paths to track, usually Solution.paths.
+            Paths are not modified, call update() after changing them.
+        :param int coef: Weight applied to every distance from base
+        """
+        self.paths = paths
+        self.coef = coef
+
+        # cell -> {timestep: number of robots seeing the cell then}
+        self._counts: Dict[Tuple[int, int], Dict[int, int]] = {}
+        # cell -> sorted list of the timesteps the cell was seen at
+        self._times: Dict[Tuple[int, int], List[int]] = {}
+
+        self.distance = 0.0
+        for robot, path in enumerate(paths):
+            for t, point in enumerate(path.coord_list):
+                for cell in path.surveyedNodes(point):
+                    self._add(cell, t)
+                self.distance += self._distance_term(robot, point)
+
+        self.surveillance = sum(self._bonus + times[-1] for times in self._times.values())
+
+    @property
+    def _bonus(self) -> int:
+        """Points collected the first time a cell is seen, at timestep 0"""
+        return 1
+
+    def _distance_term(self, robot: int, point: Tuple[int, int]) -> float:
+        """The distance score earned by a robot standing at point for one timestep"""
+        path = self.paths[robot]
+        return self.coef * path.base_distance(point)
+
+    @property
+    def score(self) -> float:
+        """The current fitness of the tracked paths"""
+        return self.surveillance + self.distance
+
+    def _add(self, cell: Tuple[int, int], t: int) -> None:
+        counts = self._counts.setdefault(cell, {})
+        if t in counts:
+            counts[t] += 1
+        else:
+            counts[t] = 1
+            insort(self._times.setdefault(cell, []), t)
+
+    def _remove(self, cell: Tuple[int, int], t: int) -> None:
+        counts = self._counts[cell]
+        counts[t] -= 1
+        if counts[t] == 0:
+            del counts[t]
+            times = self._times[cell]
+            times.pop(bisect_left(times, t))
+            if not times:
+                del self._times[cell]
+                del self._counts[cell]
+
+    def _surveillance_delta(self, robot: int, t: int, old: Tuple[int, int], new: Tuple[int, int]) -> int:
+        path = self.paths[robot]
+        lost = path.surveyedNodes(old)
+        gained = path.surveyedNodes(new)
+        out = 0
+
+        for cell in lost:
+            if cell in gained:
+                continue
+            times = self._times[cell]
+            # Only losing the last sighting of a cell changes its score
+            if times[-1] == t and self._counts[cell][t] == 1:
+                out -= (t - times[-2]) if len(times) > 1 else (self._bonus + t)
+
+        for cell in gained:
+            if cell in lost:
+                continue
+            times = self._times.get(cell)
+            if times is None:
+                out += self._bonus + t
+            elif times[-1] < t:
+                out += t - times[-1]
+
+        return out
+
+    def delta(self, robot: int, index: int, old: Tuple[int, int], new: Tuple[int, int]) -> float:
+        """Get the change in fitness from moving one point, without applying it
+
+        :param int robot: The index of the path in self.paths
+        :param int index: The index of the point in the path's coord_list
+        :param Tuple[int, int] old: The point's current coordinate
+        :param Tuple[int, int] new: The point's proposed coordinate
+        """
+        if old == new:
+            return 0.0
+        return (
+            self._surveillance_delta(robot, index, old, new)
+            + self._distance_term(robot, new)
+            - self._distance_term(robot, old)
+        )
+
+    def update(self, robot: int, index: int, old: Tuple[int, int], new: Tuple[int, int]) -> float:
+        """Record that one point has moved, and return the change in fitness
+
+        Arguments are the same as for delta()
+        """
+        if old == new:
+            return 0.0
+
+        surveillance = self._surveillance_delta(robot, index, old, new)
+        distance = self._distance_term(robot, new) - self._distance_term(robot, old)
+
+        path = self.paths[robot]
+        for cell in path.surveyedNodes(old):
+            self._remove(cell, index)
+        for cell in path.surveyedNodes(new):
+            self._add(cell, index)
+
+        self.surveillance += surveillance
+        self.distance += distance
+        return surveillance + distance
+
+
+class IncrementalPathFitness(IncrementalFitness):
+    def __init__(self, path: "Path"):
+        """Track a single path's fitness under single point mutations
+
+        Matches Path.fitness_func, up to floating point rounding. The
+        distance term is kept separately from path.distance_multiplier,
+        so the multiplier can change freely between evaluations.
+
+        Use robot index 0 with delta() and update(). The first point of
+        the path must not move, every distance is measured from it.
+        """
+        self._start = path.coord_list[0]
+        super().__init__([path], coef=1)
+
+    @property
+    def _bonus(self) -> int:
+        return 10 * self.paths[0].battery_life
+
+    def _distance_term(self, robot: int, point: Tuple[int, int]) -> float:
+        path = self.paths[robot]
+        field = path.warehouse.distance_field(self._start, "euclidean")
+        return sum(field[p] for p in path.surveyedNodes(point))
+
+    @property
+    def score(self) -> float:
+        return self.surveillance + self.paths[0].distance_multiplier * self.distance
+
+    def delta(self, robot: int, index: int, old: Tuple[int, int], new: Tuple[int, int]) -> float:
+        if old == new:
+            return 0.0
+        return (
+            self._surveillance_delta(robot, index, old, new)
+            + self.paths[0].distance_multiplier
+            * (self._distance_term(robot, new) - self._distance_term(robot, old))
+        )
+
+    def update(self, robot: int, index: int, old: Tuple[int, int], new: Tuple[int, int]) -> float:
+        before = self.score
+        super().update(robot, index, old, new)
+        return self.score - before
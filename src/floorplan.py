@@ -0,0 +1,177 @@
+# Base python imports
+import argparse
+from typing import List, Optional, Tuple
+
+# Extended python imports
+import numpy as np
+
+# Project imports
+from utils import Warehouse
+
+LAYOUTS = ("aisles", "vertical", "open")
+BASE_PLACEMENTS = ("edge", "spread", "random")
+
+
+def generate_grid(
+    height: int,
+    width: int,
+    layout: str = "aisles",
+    block_rows: int = 9,
+    block_cols: int = 12,
+    rack_density: float = 1.0,
+    obstacle_density: float = 0.0,
+    seed: Optional[int] = None
+) -> np.ndarray:
+    """Procedurally generate a warehouse occupancy grid
+
+    The floor is surrounded by a wall and split into blocks by main
+    aisles (rows) and cross aisles (columns) that are never obstructed.
+    In the "aisles" layout, each block is filled with back to back rack
+    rows separated by single pick aisles; "vertical" is the same layout
+    rotated, and "open" has no racks at all.
+
+    Every free cell stays reachable from every other one:
+        * each rack row touches a pick aisle or main aisle, and each pick
+          aisle runs the full width of its block, into the cross aisles
+        * gaps left in racks (rack_density < 1) only add connections
+        * random obstacles are single cells whose eight neighbors are all
+          free, and no two of them touch, so it is always possible to
+          walk around them
+
+    :param int height: Number of rows, including the outer walls
+    :param int width: Number of columns, including the outer walls
+    :param str layout: One of "aisles", "vertical" or "open"
+    :param int block_rows: Rows in each block between main aisles
+    :param int block_cols: Columns in each block between cross aisles
+    :param float rack_density: Fraction of rack positions that hold a rack
+    :param float obstacle_density: Chance that each eligible open cell
+        holds an obstacle
+    :param int seed: Seed for the random number generator
+
+    :rtype: np.ndarray
+    :returns: A (height, width) boolean array, True where occupied
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout}. Expected one of {LAYOUTS}")
+    if layout == "vertical":
+        return generate_grid(
+            width, height, "aisles", block_cols, block_rows,
+            rack_density, obstacle_density, seed
+        ).T.copy()
+
+    rng = np.random.default_rng(seed)
+    rows, cols = np.indices((height, width))
+
+    grid = np.zeros((height, width), dtype=bool)
+    grid[[0, -1], :] = True
+    grid[:, [0, -1]] = True
+
+    if layout == "aisles":
+        # Position of each cell within its block, main aisles are at 0
+        block_row = (rows - 1) % (block_rows + 1)
+        block_col = (cols - 1) % (block_cols + 1)
+        in_block = (block_row != 0) & (block_col != 0)
+
+        # The last interior row and column are always aisles, so
+        # truncated blocks still open onto an aisle
+        in_block &= (rows < height - 2) & (cols < width - 2)
+
+        # Back to back racks, then a pick aisle: rack, rack, aisle, ...
+        rack = in_block & (block_row % 3 != 0)
+        rack &= rng.random((height, width)) < rack_density
+        grid |= rack
+
+    if obstacle_density > 0:
+        # Obstacles only go on cells where they can be walked around
+        open_ring = np.ones((height, width), dtype=bool)
+        padded = np.pad(grid, 1, constant_values=True)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                open_ring &= ~padded[1 + dx:1 + dx + height, 1 + dy:1 + dy + width]
+
+        # Cells on an even lattice never touch each other
+        lattice = (rows % 2 == 0) & (cols % 2 == 0)
+        obstacles = open_ring & lattice & (rng.random((height, width)) < obstacle_density)
+        grid |= obstacles
+
+    return grid
+
+
+def place_bases(grid: np.ndarray, bases: int, placement: str = "edge", seed: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Choose free cells for the robots' charging stations
+
+    :param np.ndarray grid: The occupancy grid, True where occupied
+    :param int bases: How many bases to place
+    :param str placement: "edge" spreads them along the bottom row,
+        "spread" spreads them evenly over every free cell, and
+        "random" picks free cells at random
+    :param int seed: Seed for the random number generator, used by "random"
+    """
+    if placement not in BASE_PLACEMENTS:
+        raise ValueError(f"Unknown base placement: {placement}. Expected one of {BASE_PLACEMENTS}")
+
+    if placement == "edge":
+        # The bottom interior row is always an aisle
+        row = grid.shape[0] - 2
+        candidates = np.flatnonzero(~grid[row]) + row * grid.shape[1]
+    else:
+        candidates = np.flatnonzero(~grid)
+
+    if bases > len(candidates):
+        raise ValueError(f"Cannot place {bases} bases on {len(candidates)} free cells")
+
+    if placement == "random":
+        chosen = np.random.default_rng(seed).choice(candidates, size=bases, replace=False)
+    else:
+        chosen = candidates[np.linspace(0, len(candidates) - 1, bases).round().astype(int)]
+
+    return [divmod(int(c), grid.shape[1]) for c in chosen]
+
+
+def generate_warehouse(
+    height: int,
+    width: int,
+    bases: int = 1,
+    layout: str = "aisles",
+    base_placement: str = "edge",
+    block_rows: int = 9,
+    block_cols: int = 12,
+    rack_density: float = 1.0,
+    obstacle_density: float = 0.0,
+    seed: Optional[int] = None
+) -> Warehouse:
+    """Procedurally generate a connected warehouse
+
+    See generate_grid and place_bases for the parameters. The same
+    parameters and seed always produce the same warehouse.
+    """
+    grid = generate_grid(
+        height, width, layout, block_rows, block_cols,
+        rack_density, obstacle_density, seed
+    )
+    return Warehouse.from_grid(grid, place_bases(grid, bases, base_placement, seed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a warehouse floor plan")
+    parser.add_argument("output", help="A .txt or .png file to write the warehouse to")
+    parser.add_argument("--size", type=int, nargs=2, default=[64, 64], metavar=("HEIGHT", "WIDTH"))
+    parser.add_argument("--bases", type=int, default=1)
+    parser.add_argument("--layout", choices=LAYOUTS, default="aisles")
+    parser.add_argument("--base-placement", choices=BASE_PLACEMENTS, default="edge")
+    parser.add_argument("--block-rows", type=int, default=9)
+    parser.add_argument("--block-cols", type=int, default=12)
+    parser.add_argument("--rack-density", type=float, default=1.0)
+    parser.add_argument("--obstacle-density", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    w = generate_warehouse(
+        *args.size, args.bases, args.layout, args.base_placement,
+        args.block_rows, args.block_cols, args.rack_density,
+        args.obstacle_density, args.seed
+    )
+    if args.output.endswith(".png"):
+        w.write_warehouse_to_png(args.output)
+    else:
+        w.write_warehouse_to_txt(args.output)
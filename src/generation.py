@@ -1,8 +1,9 @@
 # Base python imports
-from typing import List
+from typing import Callable, List, Optional
 import random
 
 # Project imports
+from path import Path
 from solution import Solution
 
 class Generation:
@@ -12,16 +13,22 @@ class Generation:
     def copy(self):
         return Generation([s.copy() for s in self.solutions])
 
-    def mutate(self):
+    def mutate(self, mutator: Optional[Callable[[Path], object]] = None):
         """Insert a random mutation into a random path 
         in a random solution
 
+        :param mutator: Applies the mutation, e.g. an
+            operators.SegmentMutator. Defaults to Path.mutate.
+
         :rtype: Path
         :returns: The path that was mutated
         """
         sol = random.choice(self.solutions)
         path = random.choice(sol.paths)
-        path.mutate()
+        if mutator is None:
+            path.mutate()
+        else:
+            mutator(path)
         return path
     
     def crossover(
@@ -0,0 +1,172 @@
+# Base python imports
+import sys
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+# Project imports
+import fitness
+
+
+class _Phase:
+    """Times a block of code, adding the elapsed time to one phase"""
+
+    __slots__ = ("_totals", "_name", "_started")
+
+    def __init__(self, totals: Dict[str, float], name: str):
+        self._totals = totals
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._totals[self._name] += time.perf_counter() - self._started
+
+
+class Instrument:
+    def __init__(self, *sinks: Callable[[Dict], None]):
+        """Per cycle timers and counters for the GA
+
+        Wrap each phase of a cycle in `with instrument.phase(name):`,
+        count events with count(), then call end_cycle() to send one
+        record to every sink. Each record holds:
+            * cycle: The cycle number
+            * phases: Seconds spent in each phase
+            * counters: Events counted during the cycle
+            * cache: Fitness cache hits and misses during the cycle, see
+              fitness.CacheStats
+            * net_blocks: The net change in the number of memory blocks
+              the interpreter holds, see sys.getallocatedblocks. Blocks
+              allocated and freed within the cycle don't count.
+
+        Sinks are called with each record: any function, a
+        checkpoint.JsonLinesProgress to stream records to a file, or a
+        Summary to aggregate them in memory.
+
+        :param sinks: Where to send records
+        """
+        self.sinks = list(sinks)
+        self._phases: Dict[str, float] = defaultdict(float)
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._start_cycle()
+
+    def _start_cycle(self) -> None:
+        self._phases.clear()
+        self._counters.clear()
+        self._cache = (
+            fitness.stats.path_hits, fitness.stats.path_misses,
+            fitness.stats.solution_hits, fitness.stats.solution_misses,
+        )
+        self._blocks = sys.getallocatedblocks()
+
+    def phase(self, name: str) -> _Phase:
+        """Time a phase of the current cycle, as a context manager"""
+        return _Phase(self._phases, name)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Add n to a counter of the current cycle"""
+        self._counters[name] += n
+
+    def end_cycle(self, cycle: int) -> Dict:
+        """Send the current cycle's record to every sink, and start the next one
+
+        :rtype: Dict
+        :returns: The record
+        """
+        stats = fitness.stats
+        now = (stats.path_hits, stats.path_misses, stats.solution_hits, stats.solution_misses)
+        record = {
+            "cycle": cycle,
+            "phases": dict(self._phases),
+            "counters": dict(self._counters),
+            "cache": dict(zip(
+                ("path_hits", "path_misses", "solution_hits", "solution_misses"),
+                (b - a for a, b in zip(self._cache, now))
+            )),
+            "net_blocks": sys.getallocatedblocks() - self._blocks,
+        }
+        for sink in self.sinks:
+            sink(record)
+        self._start_cycle()
+        return record
+
+
+class _NullPhase:
+    """A phase that does nothing, shared by every NullInstrument"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class NullInstrument(Instrument):
+    """The instrument used when none is given, records nothing"""
+
+    _phase = _NullPhase()
+
+    def __init__(self):
+        self.sinks = []
+
+    def phase(self, name: str) -> _NullPhase:
+        return self._phase
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    def end_cycle(self, cycle: int) -> Dict:
+        return {}
+
+
+# Shared default, so uninstrumented runs don't build one per call
+NULL_INSTRUMENT = NullInstrument()
+
+
+class Summary:
+    def __init__(self):
+        """Aggregate instrument records in memory
+
+        Pass one to an Instrument, then read totals() or print report()
+        when the run is done.
+        """
+        self.records: List[Dict] = []
+
+    def __call__(self, record: Dict) -> None:
+        self.records.append(record)
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        """Sum every phase, counter and cache statistic over all cycles
+
+        :rtype: Dict[str, Dict[str, float]]
+        :returns: The totals, grouped like a record's phases, counters and cache
+        """
+        out: Dict[str, Dict[str, float]] = {"phases": {}, "counters": {}, "cache": {}}
+        for record in self.records:
+            for group, values in out.items():
+                for name, value in record[group].items():
+                    values[name] = values.get(name, 0) + value
+        return out
+
+    def report(self, file=None) -> None:
+        """Print each phase's share of the time, and the mean counts per cycle"""
+        cycles = max(len(self.records), 1)
+        totals = self.totals()
+        elapsed = sum(totals["phases"].values()) or 1.0
+
+        print(f"{cycles} cycles, {elapsed:.3f}s instrumented", file=file)
+        for name, seconds in sorted(totals["phases"].items(), key=lambda x: -x[1]):
+            print(
+                f"{name:>16}: {seconds:9.3f}s {100 * seconds / elapsed:5.1f}% "
+                f"{1000 * seconds / cycles:9.3f} ms/cycle",
+                file=file
+            )
+        for group in ("counters", "cache"):
+            for name, value in sorted(totals[group].items()):
+                print(f"{name:>16}: {value / cycles:12.1f} per cycle", file=file)
+        blocks = sum(r["net_blocks"] for r in self.records)
+        print(f"{'net blocks':>16}: {blocks / cycles:12.1f} per cycle", file=file)
@@ -0,0 +1,232 @@
+# Base python imports
+import multiprocessing as mp
+import queue
+import random
+import traceback
+from typing import Dict, List, Tuple
+
+# Extended python imports
+import numpy as np
+
+# Project imports
+from evolution import breed, rank
+from generation import Generation
+from main import generation_factory
+from solution import Solution
+from utils import Warehouse
+
+TOPOLOGIES = ("ring", "random")
+
+# The cell arrays of a solution's paths, see Solution.to_cells
+Encoded = List[np.ndarray]
+
+
+def migration_targets(islands: int, epoch: int, topology: str, seed: int) -> List[int]:
+    """Decide which island each island sends its migrants to
+
+    Every island sends to exactly one other island, and receives from
+    exactly one, so migration can be synchronous. The "random"
+    topology draws a new ring at every epoch, from a generator seeded
+    identically on every island.
+
+    :rtype: List[int]
+    :returns: The destination of each island's migrants
+    """
+    order = list(range(islands))
+    if topology == "random":
+        random.Random(seed * 1_000_003 + epoch).shuffle(order)
+    elif topology != "ring":
+        raise ValueError(f"Unknown topology: {topology}. Expected one of {TOPOLOGIES}")
+
+    out = [0] * islands
+    for i, island in enumerate(order):
+        out[island] = order[(i + 1) % islands]
+    return out
+
+
+def migrate(
+    gen: Generation,
+    index: int,
+    epoch: int,
+    migrants: int,
+    topology: str,
+    seed: int,
+    inboxes: List
+) -> None:
+    """Send copies of this island's best solutions to its neighbor, and
+    replace its worst solutions with the ones it receives
+
+    :param Generation gen: This island's generation, ranked best first
+    :param int index: This island's index
+    :param list inboxes: One queue per island
+    """
+    targets = migration_targets(len(inboxes), epoch, topology, seed)
+    inboxes[targets[index]].put([s.to_cells() for s in gen.solutions[:migrants]])
+
+    arrivals: List[Encoded] = inboxes[index].get()
+    template = gen.solutions[0]
+    for i, cells in enumerate(arrivals):
+        gen.solutions[-1 - i] = template.with_cells(cells)
+
+
+def run_island(
+    index: int,
+    warehouse: Warehouse,
+    batt: int,
+    population: int,
+    cycles: int,
+    migration_interval: int,
+    migrants: int,
+    topology: str,
+    seed: int,
+    inboxes: List
+) -> Tuple[Encoded, List[Tuple[int, float, float]]]:
+    """Evolve a single island's population
+
+    :rtype: Tuple[Encoded, List[Tuple[int, float, float]]]
+    :returns:
+        * The island's best solution, encoded
+        * A trace of (cycle, best fitness, mean fitness) for every cycle
+    """
+    random.seed(seed * 1_000_003 + index)
+    curr = generation_factory(warehouse, batt, population)
+    trace = []
+
+    for c in range(cycles):
+        rank(curr)
+        if len(inboxes) > 1 and c > 0 and c % migration_interval == 0:
+            migrate(curr, index, c // migration_interval, migrants, topology, seed, inboxes)
+            rank(curr)
+
+        scores = [s.fitness_val for s in curr.solutions]
+        trace.append((c, scores[0], sum(scores) / len(scores)))
+        curr = breed(curr)
+
+    rank(curr)
+    return curr.solutions[0].to_cells(), trace
+
+
+def _island_process(results, index: int, *args) -> None:
+    """Post the island's result, or the traceback of what stopped it"""
+    try:
+        results.put((index, run_island(index, *args), None))
+    except BaseException:
+        results.put((index, None, traceback.format_exc()))
+
+
+def _collect(processes: List, results, poll: float = 1.0) -> Dict[int, Tuple[Encoded, List[Tuple[int, float, float]]]]:
+    """Wait for every island's result
+
+    The other islands would wait forever for migrants from an island
+    that stopped, so the first failure stops them all.
+
+    :raises RuntimeError: If an island raised, or its process died
+    """
+    finished = {}
+    try:
+        while len(finished) < len(processes):
+            try:
+                index, result, error = results.get(timeout=poll)
+            except queue.Empty:
+                for i, p in enumerate(processes):
+                    if i not in finished and p.exitcode not in (None, 0):
+                        raise RuntimeError(f"Island {i} died with exit code {p.exitcode}")
+                continue
+            if error is not None:
+                raise RuntimeError(f"Island {index} failed:\n{error}")
+            finished[index] = result
+    finally:
+        if len(finished) < len(processes):
+            for p in processes:
+                p.terminate()
+    return finished
+
+
+def run_islands(
+    warehouse: Warehouse,
+    batt: int,
+    islands: int = 4,
+    population: int = 12,
+    cycles: int = 500,
+    migration_interval: int = 10,
+    migrants: int = 2,
+    topology: str = "ring",
+    seed: int = 0
+) -> Tuple[Solution, Dict[int, List[Tuple[int, float, float]]]]:
+    """Evolve several populations in parallel processes, migrating the
+    best solutions between them every few cycles
+
+    Each island gets the warehouse once, when its process starts, and
+    migrants travel as compact cell arrays. Results only depend on the
+    seed, not on process scheduling.
+
+    :param Warehouse warehouse: The warehouse to patrol
+    :param int batt: The robots' battery life
+    :param int islands: The number of populations, one process each
+    :param int population: The number of solutions on each island
+    :param int cycles: How many cycles each island evolves for
+    :param int migration_interval: Migrate every this many cycles
+    :param int migrants: How many solutions each island sends
+    :param str topology: "ring" always sends to the next island, "random"
+        shuffles the ring at every migration
+    :param int seed: Seeds every island's random number generator
+
+    :rtype: Tuple[Solution, Dict[int, List[Tuple[int, float, float]]]]
+    :returns:
+        * The best solution found on any island
+        * Each island's trace of (cycle, best fitness, mean fitness)
+    """
+    if topology not in TOPOLOGIES:
+        raise ValueError(f"Unknown topology: {topology}. Expected one of {TOPOLOGIES}")
+    if not 0 < migrants <= population // 2:
+        raise ValueError("Islands must send at least one, and at most half, of their solutions")
+
+    ctx = mp.get_context()
+    inboxes = [ctx.Queue() for _ in range(islands)]
+    results = ctx.Queue()
+    args = (warehouse, batt, population, cycles, migration_interval, migrants, topology, seed, inboxes)
+
+    processes = [
+        ctx.Process(target=_island_process, args=(results, i, *args), daemon=True)
+        for i in range(islands)
+    ]
+    for p in processes:
+        p.start()
+    finished = _collect(processes, results)
+    for p in processes:
+        p.join()
+
+    template = generation_factory(warehouse, batt, 1).solutions[0]
+    best = max(
+        (template.with_cells(cells) for cells, _ in finished.values()),
+        key=lambda s: s.fitness_func()
+    )
+    return best, {i: trace for i, (_, trace) in sorted(finished.items())}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Run the island model genetic algorithm")
+    parser.add_argument("warehouse")
+    parser.add_argument("--battery", type=int, default=30)
+    parser.add_argument("--islands", type=int, default=4)
+    parser.add_argument("--population", type=int, default=12)
+    parser.add_argument("--cycles", type=int, default=500)
+    parser.add_argument("--migration-interval", type=int, default=10)
+    parser.add_argument("--migrants", type=int, default=2)
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="ring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace", help="Write each island's fitness trace to this JSON file")
+    args = parser.parse_args()
+
+    best, traces = run_islands(
+        Warehouse(args.warehouse), args.battery, args.islands, args.population,
+        args.cycles, args.migration_interval, args.migrants, args.topology, args.seed
+    )
+    print(f"Best fitness: {best.fitness_func()}")
+
+    if args.trace:
+        with open(args.trace, "w") as f:
+            json.dump({str(i): t for i, t in traces.items()}, f)
@@ -0,0 +1,124 @@
+# Base python imports
+import os
+
+# Extended python imports
+import numpy as np
+
+# Compiled inner loops, with pure NumPy fallbacks. Numba is used when it
+# is installed, unless the VRP_KERNELS environment variable is "numpy".
+# Both backends give identical results, see benchmark.py --mode kernels.
+#
+# The backend is picked, and Numba imported, the first time a kernel
+# (or BACKEND, or numba) is looked up on this module, see __getattr__.
+
+
+def last_seen_numpy(table: np.ndarray, cells: np.ndarray, size: int) -> np.ndarray:
+    """Find the last timestep each cell is seen at, in every solution
+
+    :param np.ndarray table: A visibility table, see Warehouse.visibility_table
+    :param np.ndarray cells: A (solutions, robots, timesteps) array of cell ids
+    :param int size: The number of cells in the warehouse
+
+    :rtype: np.ndarray
+    :returns: A (solutions, size) int64 array, -1 for cells never seen
+    """
+    pop, _, steps = cells.shape
+    seen = table[cells]
+    times = np.broadcast_to(np.arange(steps)[None, None, :, None], seen.shape)
+    visible = seen >= 0
+
+    # Offset each solution's cell ids, so one scratch array holds all of them
+    offsets = np.broadcast_to((np.arange(pop) * size)[:, None, None, None], seen.shape)
+    latest = np.full(pop * size, -1, dtype=np.int64)
+    np.maximum.at(latest, (seen + offsets)[visible], times[visible])
+    return latest.reshape(pop, size)
+
+
+def robot_bits(robots: int) -> int:
+    """The number of low bits last_seen_by uses for the robot"""
+    return max(robots - 1, 0).bit_length()
+
+
+def last_seen_by_numpy(table: np.ndarray, cells: np.ndarray, size: int) -> np.ndarray:
+    """Find the last timestep each cell is seen at, and by which robot
+
+    :param np.ndarray table: A visibility table, see Warehouse.visibility_table
+    :param np.ndarray cells: A (solutions, robots, timesteps) array of cell ids
+    :param int size: The number of cells in the warehouse
+
+    :rtype: np.ndarray
+    :returns: A (solutions, size) int64 array of timestep << robot_bits(robots)
+        | robot, -1 for cells never seen. When robots see a cell at the
+        same timestep, the last robot gets it.
+    """
+    pop, robots, steps = cells.shape
+    seen = table[cells]
+    keys = np.broadcast_to(
+        ((np.arange(steps)[None, :] << robot_bits(robots)) | np.arange(robots)[:, None])[None, :, :, None],
+        seen.shape
+    )
+    visible = seen >= 0
+
+    offsets = np.broadcast_to((np.arange(pop) * size)[:, None, None, None], seen.shape)
+    latest = np.full(pop * size, -1, dtype=np.int64)
+    np.maximum.at(latest, (seen + offsets)[visible], keys[visible])
+    return latest.reshape(pop, size)
+
+
+def mutation_indices_numpy(cells: np.ndarray, width: int) -> np.ndarray:
+    """Find the indices of a path whose neighbors are at most one step
+    apart, including diagonally
+
+    :param np.ndarray cells: A path's cell ids
+    :param int width: The width of the warehouse
+    """
+    rows, cols = np.divmod(cells, width)
+    close = (np.abs(rows[2:] - rows[:-2]) <= 1) & (np.abs(cols[2:] - cols[:-2]) <= 1)
+    return np.flatnonzero(close) + 1
+
+
+# Names set by _load
+_BACKEND_NAMES = {
+    "numba", "BACKEND",
+    "last_seen", "last_seen_by", "mutation_indices",
+    "last_seen_numba", "last_seen_by_numba", "mutation_indices_numba",
+}
+
+
+def _load() -> None:
+    """Pick a backend, and bind the kernels to it"""
+    compiled = None
+    if os.environ.get("VRP_KERNELS", "numba") != "numpy":
+        try:
+            import kernels_numba as compiled
+        except ImportError:
+            pass
+
+    names = globals()
+    if compiled is not None:
+        names.update(
+            numba=compiled.numba,
+            BACKEND="numba",
+            last_seen_numba=compiled.last_seen_numba,
+            last_seen_by_numba=compiled.last_seen_by_numba,
+            mutation_indices_numba=compiled.mutation_indices_numba,
+            last_seen=compiled.last_seen_numba,
+            last_seen_by=compiled.last_seen_by_numba,
+            mutation_indices=compiled.mutation_indices_numba,
+        )
+    else:
+        names.update(
+            numba=None,
+            BACKEND="numpy",
+            last_seen=last_seen_numpy,
+            last_seen_by=last_seen_by_numpy,
+            mutation_indices=mutation_indices_numpy,
+        )
+
+
+def __getattr__(name: str):
+    if name in _BACKEND_NAMES and "BACKEND" not in globals():
+        _load()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
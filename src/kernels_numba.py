@@ -0,0 +1,54 @@
+# Extended python imports
+import numba
+import numpy as np
+
+# The compiled versions of the kernels in kernels.py. Importing Numba
+# takes longer than loading the rest of the solver, so kernels.py only
+# imports this module the first time a kernel is used.
+
+
+
+@numba.njit(cache=True, nogil=True)
+def last_seen_numba(table, cells, size):
+    pop, robots, steps = cells.shape
+    latest = np.full((pop, size), -1, dtype=np.int64)
+    for s in range(pop):
+        # Timesteps only increase, so the last write is the latest
+        for t in range(steps):
+            for r in range(robots):
+                row = table[cells[s, r, t]]
+                for k in range(row.shape[0]):
+                    if row[k] >= 0:
+                        latest[s, row[k]] = t
+    return latest
+
+
+@numba.njit(cache=True, nogil=True)
+def last_seen_by_numba(table, cells, size):
+    pop, robots, steps = cells.shape
+    bits = 0
+    while (1 << bits) < robots:
+        bits += 1
+    latest = np.full((pop, size), -1, dtype=np.int64)
+    for s in range(pop):
+        # Keys only increase, so the last write is the largest
+        for t in range(steps):
+            for r in range(robots):
+                row = table[cells[s, r, t]]
+                for k in range(row.shape[0]):
+                    if row[k] >= 0:
+                        latest[s, row[k]] = (t << bits) | r
+    return latest
+
+
+@numba.njit(cache=True, nogil=True)
+def mutation_indices_numba(cells, width):
+    out = np.empty(max(len(cells) - 2, 0), dtype=np.int64)
+    n = 0
+    for i in range(1, len(cells) - 1):
+        a = cells[i - 1]
+        b = cells[i + 1]
+        if abs(a // width - b // width) <= 1 and abs(a % width - b % width) <= 1:
+            out[n] = i
+            n += 1
+    return out[:n]
@@ -1,19 +1,25 @@
-from path import Path, save_multiple_paths_as_gif, simulated_annealing, path_evolution_gif
+from path import Path, save_multiple_paths_as_gif
 from utils import Warehouse
 from solution import Solution
 from generation import Generation
 from evolution import evolve
-import copy
-from progress.bar import Bar
-import random
+from typing import Sequence, Union
 
-def solution_factory(w: Warehouse, batt: int):
+def solution_factory(w: Warehouse, batt: Union[int, Sequence[int]]):
+    """Build a random solution
+
+    :param Warehouse w: The warehouse to patrol
+    :param batt: The battery life of one robot per base, or of each
+        robot, with robots assigned to bases in turn
+    """
+    if isinstance(batt, int):
+        batt = [batt] * len(w.bases)
     paths = []
-    for base in w.bases:
-        paths.append(Path(w, base, battery_life=batt))
+    for i, b in enumerate(batt):
+        paths.append(Path(w, w.bases[i % len(w.bases)], battery_life=b))
     return Solution(paths)
 
-def generation_factory(w: Warehouse, batt: int, size: int):
+def generation_factory(w: Warehouse, batt: Union[int, Sequence[int]], size: int):
     solutions = []
     for i in range(size):
         solutions.append(solution_factory(w, batt))
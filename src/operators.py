@@ -0,0 +1,433 @@
+# Base python imports
+import random
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Extended python imports
+import numpy as np
+
+# Project imports
+from generation import Generation
+from path import Path
+from solution import Solution
+from utils import MIDDLE_OFFSETS, Warehouse
+
+
+class WalkCache:
+    def __init__(self, warehouse: Warehouse, size: int = 4096):
+        """Sample walks of an exact number of steps between two cells
+
+        A walk of n steps from a to b exists whenever b is at most n
+        steps from a, since robots may wait in place. Walks are drawn one
+        step at a time, only ever moving to cells from which b is still
+        reachable in time, using the distance to b within n steps of it.
+        Those local distance maps are kept in a least recently used cache,
+        so walks towards the same cell are cheap. They are dropped when
+        the warehouse changes, see Warehouse.apply_diff.
+
+        :param Warehouse warehouse: The warehouse to walk in
+        :param int size: How many distance maps to keep
+        """
+        self.warehouse = warehouse
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._revision = warehouse.revision
+        # target cell -> (radius, top row, left column, distances)
+        self._maps: "OrderedDict[int, Tuple[int, int, int, np.ndarray]]" = OrderedDict()
+
+    def distances(self, target: int, radius: int) -> Tuple[int, int, np.ndarray]:
+        """Get the walking distance to a cell from every cell at most
+        radius steps from it
+
+        :rtype: Tuple[int, int, np.ndarray]
+        :returns:
+            * The row and column of the map's top left corner
+            * A 2D int32 array of distances, -1 where occupied or too far
+        """
+        if self._revision != self.warehouse.revision:
+            self._maps.clear()
+            self._revision = self.warehouse.revision
+
+        entry = self._maps.get(target)
+        if entry is not None and entry[0] >= radius:
+            self.hits += 1
+            self._maps.move_to_end(target)
+            return entry[1], entry[2], entry[3]
+        self.misses += 1
+
+        row, col = divmod(target, self.warehouse.shape[1])
+        top, left = max(row - radius, 0), max(col - radius, 0)
+        free = self.warehouse.free_mask()[top:row + radius + 1, left:col + radius + 1]
+
+        dist = np.full(free.shape, -1, dtype=np.int32)
+        frontier = np.zeros(free.shape, dtype=bool)
+        frontier[row - top, col - left] = free[row - top, col - left]
+        dist[frontier] = 0
+        for step in range(1, radius + 1):
+            grown = np.zeros_like(frontier)
+            grown[1:] |= frontier[:-1]
+            grown[:-1] |= frontier[1:]
+            grown[:, 1:] |= frontier[:, :-1]
+            grown[:, :-1] |= frontier[:, 1:]
+            frontier = grown & free & (dist < 0)
+            if not frontier.any():
+                break
+            dist[frontier] = step
+
+        self._maps[target] = (radius, top, left, dist)
+        self._maps.move_to_end(target)
+        if len(self._maps) > self.size:
+            self._maps.popitem(last=False)
+        return top, left, dist
+
+    def walk(self, start: int, end: int, steps: int) -> Optional[List[int]]:
+        """Draw a random walk of exactly `steps` steps from start to end
+
+        Each step waits in place or moves to a free 4-connected neighbor.
+
+        :rtype: Optional[List[int]]
+        :returns: The steps + 1 cell ids of the walk, including both ends,
+            or None if end is too far from start
+        """
+        w = self.warehouse.shape[1]
+        top, left, dist = self.distances(end, steps)
+        h_box, w_box = dist.shape
+
+        def remaining(r: int, c: int) -> int:
+            """Steps from a cell to end, in map coordinates, -1 if too far"""
+            if 0 <= r < h_box and 0 <= c < w_box:
+                return dist[r, c]
+            return -1
+
+        r, c = divmod(start, w)
+        r -= top
+        c -= left
+        if not 0 <= remaining(r, c) <= steps:
+            return None
+
+        out = [start]
+        for left_steps in range(steps - 1, -1, -1):
+            options = [
+                (r + dr, c + dc) for dr, dc in MIDDLE_OFFSETS
+                if 0 <= remaining(r + dr, c + dc) <= left_steps
+            ]
+            r, c = random.choice(options)
+            out.append((r + top) * w + c + left)
+        return out
+
+
+def _adjacent(a: np.ndarray, b: np.ndarray, width: int) -> np.ndarray:
+    """Whether a robot can go from cell a to cell b in one timestep"""
+    return np.abs(a // width - b // width) + np.abs(a % width - b % width) <= 1
+
+
+def reroute(path: Path, cache: WalkCache, max_window: int = 16) -> bool:
+    """Replace a random window of the path with a new walk between the
+    same two points, taking the same number of steps
+
+    :returns: Whether the path changed
+    """
+    cells = path.cells
+    if len(cells) < 3:
+        return False
+    steps = random.randint(2, min(max_window, len(cells) - 1))
+    i = random.randrange(len(cells) - steps)
+
+    walk = cache.walk(int(cells[i]), int(cells[i + steps]), steps)
+    if walk is None:
+        return False
+    path.set_cells(slice(i + 1, i + steps), walk[1:-1])
+    return True
+
+
+def reverse_segment(path: Path, max_window: int = 32) -> bool:
+    """Traverse a random stretch of the path backwards (a 2-opt move)
+
+    Picks a start point, then any end point such that the path stays
+    connected once the points between them are reversed.
+
+    :returns: Whether the path changed
+    """
+    cells = path.cells
+    width = path.warehouse.shape[1]
+    if len(cells) < 4:
+        return False
+    i = random.randrange(1, len(cells) - 2)
+
+    # Reversing cells[i:j + 1] needs cells[i - 1] next to cells[j],
+    # and cells[i] next to cells[j + 1]
+    j = np.arange(i + 1, min(i + max_window, len(cells) - 1))
+    ok = _adjacent(cells[i - 1], cells[j], width) & _adjacent(cells[i], cells[j + 1], width)
+    ok &= cells[j] != cells[i]
+    if not ok.any():
+        return False
+
+    j = int(random.choice(j[ok].tolist()))
+    path.set_cells(slice(i, j + 1), cells[i:j + 1][::-1])
+    return True
+
+
+def remove_loop(path: Path, max_window: int = 32) -> bool:
+    """Cut out a stretch of the path that returns to where it started,
+    and wait in place somewhere else for the same amount of time
+
+    :returns: Whether the path changed
+    """
+    cells = path.cells
+    if len(cells) < 4:
+        return False
+    i = random.randrange(1, len(cells) - 2)
+
+    j = np.arange(i + 2, min(i + max_window, len(cells) - 1))
+    j = j[cells[j] == cells[i]]
+    if not len(j):
+        return False
+    j = int(random.choice(j.tolist()))
+
+    out = np.delete(cells, np.arange(i + 1, j + 1))
+    k = random.randrange(1, len(out) - 1)
+    path.cells = np.insert(out, k, np.repeat(out[k], j - i))
+    return True
+
+
+def insert_loop(path: Path, cache: WalkCache, max_loop: int = 16) -> bool:
+    """Stop waiting in place somewhere, and spend the time on a round
+    trip from a random point of the path instead
+
+    :returns: Whether the path changed
+    """
+    cells = path.cells
+    # Timesteps where the robot waits, never the fixed first or last point
+    waits = np.flatnonzero(cells[1:-1] == cells[:-2]) + 1
+    if len(waits) < 2:
+        return False
+
+    steps = random.randint(2, min(max_loop, len(waits)))
+    removed = random.sample(waits.tolist(), steps)
+    out = np.delete(cells, removed)
+
+    k = random.randrange(1, len(out) - 1)
+    loop = cache.walk(int(out[k]), int(out[k]), steps)
+    path.cells = np.insert(out, k + 1, loop[1:])
+    return True
+
+
+def repair(path: Path, cache: WalkCache) -> int:
+    """Reroute a path around cells that have become occupied
+
+    Each stretch of occupied cells is replaced with a walk between the
+    free points either side of it, taking the same number of steps. If
+    the detour needs more steps, the window grows on both sides until
+    one fits, so the rest of the path is left as it was. A stretch at
+    the end of the path waits at the last free point instead.
+
+    The path's cached fitness and movable points are always reset, as
+    what it sees may have changed along with the warehouse.
+
+    :raises ValueError: If no point of the path is free, or its free
+        points can't reach each other
+    :rtype: int
+    :returns: The number of points that moved
+    """
+    free = path.warehouse.free_mask().ravel()
+    old = path.cells
+    cells = old.copy()
+    n = len(cells)
+
+    bad = np.flatnonzero(~free[cells])
+    while len(bad):
+        i = j = int(bad[0])
+        while j < n and not free[cells[j]]:
+            j += 1
+        a, b = i - 1, j
+
+        margin = 1
+        while True:
+            if a < 0 and b >= n:
+                raise ValueError("Every point of the path is occupied")
+            if a < 0:
+                cells[:b] = cells[b]
+                break
+            if b >= n:
+                cells[a + 1:] = cells[a]
+                break
+            walk = cache.walk(int(cells[a]), int(cells[b]), b - a)
+            if walk is not None:
+                cells[a + 1:b] = walk[1:-1]
+                break
+            if a == 0 and b == n - 1:
+                raise ValueError("The path's free points can no longer reach each other")
+            # Points before a are already free, points after b may not be
+            a = max(a - margin, 0)
+            b = min(b + margin, n - 1)
+            while b < n and not free[cells[b]]:
+                b += 1
+            margin *= 2
+
+        bad = np.flatnonzero(~free[cells])
+
+    path.cells = cells
+    return int(np.count_nonzero(cells != old))
+
+
+# The default mix of moves used by SegmentMutator
+DEFAULT_WEIGHTS = {
+    "point": 0.5,
+    "reroute": 0.2,
+    "reverse": 0.1,
+    "insert_loop": 0.1,
+    "remove_loop": 0.1,
+}
+
+
+class SegmentMutator:
+    def __init__(
+        self,
+        warehouse: Warehouse,
+        weights: Optional[Dict[str, float]] = None,
+        max_window: int = 16,
+        cache_size: int = 4096
+    ):
+        """Mutate paths with a random mix of single point and segment moves
+
+        Pass one to evolve() (or Generation.mutate) to use it in the GA.
+        Moves that find nothing to change fall back to Path.mutate.
+
+        :param Warehouse warehouse: The warehouse the paths live in
+        :param Dict[str, float] weights: The relative chance of each move,
+            see DEFAULT_WEIGHTS
+        :param int max_window: The longest stretch of path a move rewrites
+        :param int cache_size: How many distance maps the WalkCache keeps
+        """
+        self.cache = WalkCache(warehouse, cache_size)
+        self.max_window = max_window
+        weights = weights or DEFAULT_WEIGHTS
+        self._moves = list(weights)
+        self._weights = [weights[m] for m in self._moves]
+
+    def __call__(self, path: Path) -> str:
+        """Apply one random move to a path
+
+        :rtype: str
+        :returns: The name of the move that was applied
+        """
+        move = random.choices(self._moves, self._weights)[0]
+        if move == "reroute":
+            applied = reroute(path, self.cache, self.max_window)
+        elif move == "reverse":
+            applied = reverse_segment(path, 2 * self.max_window)
+        elif move == "insert_loop":
+            applied = insert_loop(path, self.cache, self.max_window)
+        elif move == "remove_loop":
+            applied = remove_loop(path, 2 * self.max_window)
+        elif move == "point":
+            applied = False
+        else:
+            raise ValueError(f"Unknown move: {move}. Expected one of {list(DEFAULT_WEIGHTS)}")
+
+        if not applied:
+            path.mutate()
+            return "point"
+        return move
+
+
+class CoverageCrossover:
+    def __init__(self, size: int = 65536):
+        """Cross over solutions robot by robot, keeping the paths that
+        contribute the most to fitness
+
+        Pass one to evolve() (or breed) to replace the random single
+        robot swap of Generation.crossover.
+
+        Contributions come from the fitness evaluation itself, see
+        Solution.contributions, and are remembered by path key, so
+        they still apply after a path moves to another solution.
+
+        :param int size: How many paths' contributions to remember
+        """
+        self.size = size
+        # path key -> (points, cells seen last, surveillance points)
+        self._known: "OrderedDict[int, Tuple[float, int, int]]" = OrderedDict()
+        # (warehouse id, revision) -> free cells
+        self._free: Dict[Tuple[int, int], int] = {}
+
+    def _remember(self, solution: Solution) -> None:
+        if not solution.is_scored:
+            return
+        c = solution.contributions()
+        points = (c.staleness + c.distance).tolist()
+        for path, value, cells, staleness in zip(solution.paths, points, c.cells.tolist(), c.staleness.tolist()):
+            self._known[path.key] = (value, cells, staleness)
+            self._known.move_to_end(path.key)
+        while len(self._known) > self.size:
+            self._known.popitem(last=False)
+
+    def _lookup(self, solution: Solution) -> Optional[List[Tuple[float, int, int]]]:
+        out = [self._known.get(p.key) for p in solution.paths]
+        return None if None in out else out
+
+    def choose(self, a: Solution, b: Solution) -> List[bool]:
+        """Decide which robots a child of a and b takes from b
+
+        Starts from the fitter parent, then takes the other parent's path
+        for a robot when it contributes more, net of an overlap penalty.
+        The penalty assumes the cells a path is credited for are covered
+        by the rest of the child as often as any free cell is. Those cells
+        are worth less to the path taken and to the path dropped alike, so
+        only the difference in their staleness points is at risk. It costs
+        O(1) per robot.
+
+        :rtype: List[bool]
+        :returns: For each robot, whether to take b's path. Empty if
+            either parent's contributions are unknown.
+        """
+        ca, cb = self._lookup(a), self._lookup(b)
+        if ca is None or cb is None:
+            return []
+
+        warehouse = a.paths[0].warehouse
+        key = (id(warehouse), warehouse.revision)
+        free = self._free.get(key)
+        if free is None:
+            free = self._free[key] = int(warehouse.free_mask().sum())
+
+        flip = sum(x[0] for x in cb) > sum(x[0] for x in ca)
+        keep, other = (cb, ca) if flip else (ca, cb)
+        cells = [x[1] for x in keep]
+        covered = sum(cells)
+        take = [False] * len(keep)
+
+        gains = sorted(range(len(keep)), key=lambda r: other[r][0] - keep[r][0], reverse=True)
+        for r in gains:
+            gain = other[r][0] - keep[r][0]
+            if gain <= 0:
+                break
+            # Cells the rest of the child also covers are worth less to
+            # either path, so only the difference in staleness is at stake
+            rest = covered - cells[r]
+            if gain > (other[r][2] - keep[r][2]) * rest / free:
+                take[r] = True
+                covered = rest + other[r][1]
+                cells[r] = other[r][1]
+
+        return [t != flip for t in take]
+
+    def __call__(self, gen: Generation, u: int, v: int) -> None:
+        """Cross over two solutions of a generation in place
+
+        Solution u becomes the child choose() assembles, and solution v
+        gets every path u didn't take. Falls back to Generation.crossover
+        when contributions are unknown, or the child is just a parent.
+        """
+        a, b = gen.solutions[u], gen.solutions[v]
+        if a is not b:
+            self._remember(a)
+            self._remember(b)
+            take = self.choose(a, b)
+            if any(take) and not all(take):
+                for r, t in enumerate(take):
+                    if t:
+                        a.paths[r], b.paths[r] = b.paths[r], a.paths[r]
+                return
+        gen.crossover(u, v)
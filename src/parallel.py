@@ -0,0 +1,111 @@
+# Base python imports
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# Extended python imports
+import numpy as np
+
+# Project imports
+from path import Path
+from solution import Solution, evaluate_population
+from utils import Warehouse
+import fitness
+
+
+class SerialEvaluator:
+    """Evaluate every solution in a generation, one after another"""
+
+    def evaluate(self, solutions: List[Solution]) -> List[float]:
+        """Compute (or look up) the fitness of every solution
+
+        :rtype: List[float]
+        :returns: The fitness of each solution, in order
+        """
+        return evaluate_population(solutions)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Set in each worker process by _init_worker
+_worker_warehouse: Optional[Warehouse] = None
+
+
+def _init_worker(warehouse: Warehouse) -> None:
+    global _worker_warehouse
+    _worker_warehouse = warehouse
+
+
+def _worker_partials(
+    tasks: List[Tuple[np.ndarray, Tuple[int, int], int, bool, str]]
+) -> List[fitness.PathPartial]:
+    return [fitness.cells_partial(_worker_warehouse, *task) for task in tasks]
+
+
+class ProcessPoolEvaluator(SerialEvaluator):
+    def __init__(
+        self,
+        warehouse: Warehouse,
+        workers: Optional[int] = None,
+        visions: Tuple[Tuple[int, bool], ...] = ((1, False),)
+    ):
+        """Evaluate solutions across a pool of worker processes
+
+        The warehouse, along with its visibility tables, is sent to each
+        worker once when the pool starts. Tasks only carry the
+        cell arrays of paths whose cached partial result is missing;
+        the results are cached on those paths, and the cheap step of
+        combining them into solution fitnesses runs in this process.
+        Fitness values are therefore identical for any number of workers.
+
+        :param Warehouse warehouse: The warehouse every solution lives in
+        :param int workers: The number of processes. Defaults to one per CPU.
+        :param Tuple[Tuple[int, bool], ...] visions: The (vision_radius, line_of_sight)
+            settings used by the paths, so their tables are built up front
+        """
+        for radius, line_of_sight in visions:
+            warehouse.visibility_table(radius, line_of_sight)
+
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(warehouse,)
+        )
+
+    def evaluate(self, solutions: List[Solution]) -> List[float]:
+        # Collect paths that need scoring, once each
+        pending: Dict[int, List[Path]] = {}
+        for s in solutions:
+            for p in s.paths:
+                if not p.is_scored:
+                    pending.setdefault(p.key, []).append(p)
+
+        if pending:
+            keys = list(pending)
+            tasks = [
+                (p.cells, p.base, p.vision_radius, p.line_of_sight, p.distance_metric)
+                for p in (pending[k][0] for k in keys)
+            ]
+
+            # One batch of paths per worker keeps the per-task overhead low
+            size = -(-len(tasks) // self.workers)
+            batches = [tasks[i:i + size] for i in range(0, len(tasks), size)]
+            partials = [r for batch in self._pool.map(_worker_partials, batches) for r in batch]
+
+            fitness.stats.path_misses += len(partials)
+            for k, partial in zip(keys, partials):
+                for p in pending[k]:
+                    p.cache_partial(partial)
+
+        return super().evaluate(solutions)
+
+    def close(self) -> None:
+        self._pool.shutdown()
@@ -1,28 +1,153 @@
 # Base python imports
-import os
 import random
-import copy
+import itertools
+from array import array
+from collections.abc import MutableSequence
 from typing import Tuple, Optional, List, Union
 import numpy as np
 import math
 
-# Extended python imports
-from progress.bar import Bar
-from PIL import Image, ImageOps
-import png
-
 # Project imports
 from utils import Warehouse
+import fitness
+import kernels
+
+# Rendering needs Pillow, pypng and progress, which the solver itself
+# doesn't, so they are imported by the functions that use them
+
+
+# Every distinct coord_list gets a new key, so caches can tell when
+# a path has changed
+_path_keys = itertools.count()
+
+
+class CoordList(MutableSequence):
+    """A list-like view of a Path's coordinates
+
+    The coordinates are stored as a flat array of cell ids
+    (row * width + column) on the Path itself. Reads produce
+    (row, column) tuples, and writes go through the Path, which
+    copies shared arrays on write and invalidates cached fitness.
+    """
+    __slots__ = ("_path",)
+
+    def __init__(self, path: "Path"):
+        self._path = path
+
+    def __len__(self) -> int:
+        return len(self._path._cells)
+
+    def __getitem__(self, index):
+        cells = self._path._cells
+        w = self._path._width
+        if isinstance(index, slice):
+            return [divmod(c, w) for c in cells[index].tolist()]
+        return divmod(int(cells[index]), w)
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, slice):
+            self._path.set_cells(index, [self._path.cell_id(v) for v in value])
+        else:
+            self._path.set_cells(index, self._path.cell_id(value))
+
+    def __delitem__(self, index) -> None:
+        self._path.cells = np.delete(self._path._cells, index)
+
+    def insert(self, index: int, value: Tuple[int, int]) -> None:
+        self._path.cells = np.insert(self._path._cells, index, self._path.cell_id(value))
+
+    def __iter__(self):
+        w = self._path._width
+        for c in self._path._cells.tolist():
+            yield divmod(c, w)
+
+    def __reversed__(self):
+        w = self._path._width
+        for c in reversed(self._path._cells.tolist()):
+            yield divmod(c, w)
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class IndexSet:
+    """A set of path indices with O(1) add, discard and random choice
+
+    Members are kept densely packed in an int32 array, and removing one
+    moves the last member into its place. Typed arrays hold 4 bytes per
+    index, where a list holds a pointer and often an int object.
+    """
+    __slots__ = ("items", "positions")
+
+    def __init__(self, items: List[int], capacity: int):
+        self.items = array("i", items)
+        # The position of each index in items, or -1
+        self.positions = array("i", [-1]) * capacity
+        for i, item in enumerate(self.items):
+            self.positions[item] = i
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, item: int) -> bool:
+        return self.positions[item] >= 0
+
+    def add(self, item: int) -> None:
+        if self.positions[item] < 0:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+
+    def discard(self, item: int) -> None:
+        i = self.positions[item]
+        if i >= 0:
+            last = self.items.pop()
+            if last != item:
+                self.items[i] = last
+                self.positions[last] = i
+            self.positions[item] = -1
+
+    def choice(self) -> int:
+        """Pick a random member, using the random module"""
+        return self.items[random.randrange(len(self.items))]
+
+    def copy(self) -> "IndexSet":
+        out = IndexSet.__new__(IndexSet)
+        out.items = self.items[:]
+        out.positions = self.positions[:]
+        return out
 
 
 class Path:
+    __slots__ = (
+        "warehouse",
+        "base",
+        "battery_life",
+        "vision_radius",
+        "line_of_sight",
+        "distance_metric",
+        "distance_multiplier",
+        "fitness_val",
+        "key",
+        "_width",
+        "_cells",
+        "_shared",
+        "_partial",
+        "_fitness_cache",
+        "_movable",
+    )
+
     def __init__(
         self, 
         warehouse: Warehouse, 
         base: Tuple[int, int],
         battery_life: int = 100, 
         vision_radius: int = 1,
-        coord_list: Optional[List[Tuple[int, int]]] = None
+        coord_list: Optional[List[Tuple[int, int]]] = None,
+        line_of_sight: bool = False,
+        distance_metric: str = "euclidean"
     ):
         """Initialize a new (2 dimensional) Path object
 
@@ -30,26 +155,161 @@ class Path:
         The path is defined within an occupancy grid, so points in space are
         discrete and coordinates are given with integers.
 
+        Internally, points are stored as a flat int32 array of cell ids,
+        which copies share until one of them is modified.
+
         :param Warehouse warehouse: The warehouse we are opperating in.
         :param list path: An optional parameter. A list of tuples (2D points)
             that have been traveled through so far
+        :param bool line_of_sight: If True, occupied space blocks the robot's view
+        :param str distance_metric: How distance from base is measured, by the
+            initial path and the fitness function. "euclidean" or "geodesic"
+            (steps needed to walk there).
         """
         self.warehouse = warehouse
         self.base = base
         self.battery_life = battery_life
+        self.fitness_val = 0
+        self.distance_metric = distance_metric
+        self._width = warehouse.shape[1]
+        self._partial: Optional[fitness.PathPartial] = None
+        self._fitness_cache: Optional[Tuple[float, float]] = None
+        self._movable: Optional[IndexSet] = None
         # Naive coord list initialization: [self.base for i in range(self.battery_life)]
         self.coord_list = coord_list if coord_list else self.gen_init_path()
         self.vision_radius = vision_radius
+        self.line_of_sight = line_of_sight
         self.distance_multiplier = 1
 
+    @classmethod
+    def from_cells(
+        cls,
+        warehouse: Warehouse,
+        base: Tuple[int, int],
+        cells: np.ndarray,
+        vision_radius: int = 1,
+        line_of_sight: bool = False,
+        distance_metric: str = "euclidean"
+    ) -> "Path":
+        """Rebuild a path from its cell id array, e.g. after sending it
+        between processes. The battery life is the length of the array.
+        """
+        out = cls(
+            warehouse, base, len(cells), vision_radius, [base],
+            line_of_sight, distance_metric
+        )
+        out.cells = cells
+        return out
+
+    @property
+    def coord_list(self) -> CoordList:
+        """The path's coordinates, as a list-like sequence of (row, column) tuples"""
+        return CoordList(self)
+
+    @coord_list.setter
+    def coord_list(self, coords: List[Tuple[int, int]]) -> None:
+        self.cells = [self.cell_id(c) for c in coords]
+
+    @property
+    def cells(self) -> np.ndarray:
+        """The path's coordinates, as a read only array of cell ids"""
+        return self._cells
+
+    @cells.setter
+    def cells(self, cells: np.ndarray) -> None:
+        self._cells = np.array(cells, dtype=np.int32)
+        self._cells.flags.writeable = False
+        self._shared = False
+        self._movable = None
+        self.invalidate()
+
+    def cell_id(self, point: Tuple[int, int]) -> int:
+        """Convert a (row, column) coordinate into a cell id"""
+        return point[0] * self._width + point[1]
+
+    def coords(self) -> np.ndarray:
+        """Get the path's coordinates as a (T, 2) array"""
+        return np.stack(np.divmod(self._cells, self._width), axis=1)
+
+    def set_cells(self, index: Union[int, slice], cells) -> None:
+        """Overwrite part of the path, given cell ids
+
+        The cell array is copied first if it is shared with another path.
+        """
+        if self._shared:
+            self._cells = self._cells.copy()
+            if self._movable is not None:
+                self._movable = self._movable.copy()
+            self._shared = False
+        self._cells.flags.writeable = True
+        self._cells[index] = cells
+        self._cells.flags.writeable = False
+
+        # Moving one point only changes whether its neighbors can move
+        if self._movable is not None:
+            if isinstance(index, slice):
+                self._movable = None
+            else:
+                index %= len(self._cells)
+                self._update_movable(index - 1)
+                self._update_movable(index + 1)
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Drop cached fitness results, called whenever coord_list changes"""
+        self.key = next(_path_keys)
+        self._partial = None
+        self._fitness_cache = None
+
+    def partial(self) -> fitness.PathPartial:
+        """Get this path's contribution to its solution's fitness
+
+        The result is cached until coord_list changes.
+        """
+        if self._partial is None:
+            fitness.stats.path_misses += 1
+            self._partial = fitness.path_partial(self)
+        else:
+            fitness.stats.path_hits += 1
+        return self._partial
+
+    @property
+    def is_scored(self) -> bool:
+        """Whether this path's partial result is already cached"""
+        return self._partial is not None
+
+    def cache_partial(self, partial: fitness.PathPartial) -> None:
+        """Store a partial result computed elsewhere, e.g. in a worker process"""
+        self._partial = partial
+
     def copy(self):
-        return Path(
-            self.warehouse, 
-            self.base, 
-            self.battery_life, 
-            self.vision_radius, 
-            list(self.coord_list))
-        
+        """Clone the path in O(1), sharing its cell array until either is modified"""
+        out = Path.__new__(Path)
+        out.warehouse = self.warehouse
+        out.base = self.base
+        out.battery_life = self.battery_life
+        out.vision_radius = self.vision_radius
+        out.line_of_sight = self.line_of_sight
+        out.distance_metric = self.distance_metric
+        out.distance_multiplier = 1
+        out.fitness_val = 0
+        out._width = self._width
+        out._cells = self._cells
+        out._movable = self._movable
+        out._shared = self._shared = True
+
+        # Same coordinates, so cached results still apply
+        out.key = self.key
+        out._partial = self._partial
+        out._fitness_cache = self._fitness_cache
+        return out
+
+    def __deepcopy__(self, memo):
+        out = self.copy()
+        out.distance_multiplier = self.distance_multiplier
+        out.fitness_val = self.fitness_val
+        return out
+
     def get_current_location(self) -> Tuple[int, int]:
         """Get the most recent point on the path
         
@@ -97,6 +357,14 @@ class Path:
         """Get the euclidean distance between two points"""
         return ((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)**0.5
 
+    def base_distance(self, point: Tuple[int, int]) -> float:
+        """Get the distance between a point and this path's base
+
+        Looked up in the warehouse's cached distance field, using
+        self.distance_metric.
+        """
+        return self.warehouse.distance_field(self.base, self.distance_metric)[point]
+
     def gen_init_path(self) -> None:
         """Generate a better initial path"""
         # Initialize path
@@ -110,7 +378,7 @@ class Path:
             # to choose different paths when they are just as good
             choice = max(
                 choices, 
-                key = lambda x : self.euclidean_dist(self.base, x) + 
+                key = lambda x : self.base_distance(x) + 
                 (random.random()/20)
             )
             coord_list.append(choice)
@@ -130,44 +398,77 @@ class Path:
     def valid_mutation_indices(self) -> List[int]:
         """Get a list of places in the path where a mutation is possible
 
+        A point can be moved if the points before and after it are at
+        most one step apart, including diagonally.
+
         :rtype: List[int]
         :returns: All indices in self.coord_path where a mutation is possible.
         """
-        mutation_indices = []
-        
-        for i in range(1,len(self.coord_list)-1):
-            start = self.coord_list[i-1]
-            end = self.coord_list[i+1]
+        return kernels.mutation_indices(self._cells, self._width).tolist()
+
+    def movable_indices(self) -> IndexSet:
+        """Get (and maintain) the indices of every point that can move
+
+        A point can move if some free cell neighbors (or equals) both
+        the points before and after it, see Warehouse.mutation_table.
+        The set is built once, then updated as points move.
+        """
+        if self._movable is None:
+            cells = self._cells
+            indices = []
+            if len(cells) > 2:
+                table = self.warehouse.mutation_table()
+                rows, cols = np.divmod(cells, self._width)
+                dr = rows[2:] - rows[:-2]
+                dc = cols[2:] - cols[:-2]
+                close = (np.abs(dr) <= 1) & (np.abs(dc) <= 1)
+                masks = np.zeros(len(close), dtype=np.uint8)
+                masks[close] = table[cells[:-2][close], (3 * dr + dc + 4)[close]]
+                indices = (np.flatnonzero(masks) + 1).tolist()
+            self._movable = IndexSet(indices, len(cells))
+        return self._movable
+
+    def restore_movable(self, indices: List[int]) -> None:
+        """Set the movable points, in the order movable_indices() listed
+        them, e.g. when loading a checkpoint. Mutations pick points by
+        their position in that order.
+        """
+        self._movable = IndexSet(indices, len(self._cells))
 
-            # really 2 but 1.9 to avoid floating point errors
-            if self.euclidean_dist(start, end) < 1.9:  
-                 mutation_indices.append(i)
+    def _update_movable(self, index: int) -> None:
+        if 0 < index < len(self._cells) - 1:
+            if self.warehouse.mutation_middles(int(self._cells[index - 1]), int(self._cells[index + 1])):
+                self._movable.add(index)
+            else:
+                self._movable.discard(index)
 
-        return mutation_indices
-            
-    def mutate(self) -> None:
-        """Mutate around a random point where a mutation is valid"""
+    def mutate(self) -> Tuple[int, Tuple[int, int], Tuple[int, int]]:
+        """Mutate around a random point where a mutation is valid
 
-        # Find all valid places to mutate
-        potential_targets: List[int] = self.valid_mutation_indices()
+        Runs in constant time, using the warehouse's precomputed detours
+        and the path's set of movable points.
+
+        :rtype: Tuple[int, Tuple[int, int], Tuple[int, int]]
+        :returns: The mutated index, its old coordinate, and its new coordinate
+        """
+        movable = self.movable_indices()
+        if not len(movable):
+            raise IndexError("No point on the path can move")
 
         # Select a single index to mutate around
-        target_index: int = random.choice(potential_targets)
+        target_index = movable.choice()
 
-        # Find all potential muations about the index
-        n1: List[Tuple[int, int]] = set(self.get_valid_neighbors(target_index - 1))
-        n2: List[Tuple[int, int]] = set(self.get_valid_neighbors(target_index + 1))
-        overlap = n1 & n2
-    
-        # Choose a random valid neighbor to mutate to
-        mutated_coord: Tuple[int, int] = random.choice(list(overlap))
+        # Choose a random cell next to both neighbors to mutate to
+        cells = self._cells
+        middles = self.warehouse.mutation_middles(int(cells[target_index - 1]), int(cells[target_index + 1]))
+        mutated = random.choice(middles)
 
         # Add mutated coordinate into path
-        self.coord_list[target_index] = mutated_coord
+        old = int(cells[target_index])
+        self.set_cells(target_index, mutated)
 
-        # Check if valid
-        # Only run in debugging, all mutations should be valid
-        # self.check_is_valid()
+        w = self._width
+        return target_index, divmod(old, w), divmod(mutated, w)
 
     def check_is_valid(self) -> None:
         """Check that the current coord_list is valid
@@ -176,265 +477,149 @@ class Path:
 
         Raise an exception if the coordinate list is no longer valid
         """
-        for i in range(len(self.coord_list) - 1):
-            here = self.coord_list[i]
-            there = self.coord_list[i+1]
-            if (here[0] != there[0] and here[1] != there[1]):
-                print(f"Moving from: {here} to: {there} is not allowed!")
-                raise Exception(f"Invalid coord_list: {self.coord_list}")
+        rows, cols = np.divmod(self._cells, self._width)
+        diagonal = np.flatnonzero((rows[1:] != rows[:-1]) & (cols[1:] != cols[:-1]))
+        if len(diagonal):
+            i = diagonal[0]
+            print(f"Moving from: {self.coord_list[i]} to: {self.coord_list[i + 1]} is not allowed!")
+            raise Exception(f"Invalid coord_list: {self.coord_list}")
         
     def fitness_func(self):
+        if self._fitness_cache is not None and self._fitness_cache[0] == self.distance_multiplier:
+            fitness.stats.path_hits += 1
+            self.fitness_val = self._fitness_cache[1]
+            return self.fitness_val
+        fitness.stats.path_misses += 1
+
         self.fitness_val = 0
-        timeStepMap = copy.deepcopy((np.invert(self.warehouse.png_write_helper())+256)/255)
-        timeMap = copy.deepcopy(10*self.battery_life*(np.invert(self.warehouse.png_write_helper())+256)/255)
+        timeStepMap = self.warehouse.free_mask().astype(np.float64)
+        timeMap = 10*self.battery_life*timeStepMap
         
+        start_distance = self.warehouse.distance_field(self.coord_list[0], "euclidean")
         for timeStep in range(len(self.coord_list)):
             #for robot in range(len(self.coord_list[0])):
             for point in self.surveyedNodes(self.coord_list[timeStep]):
                 self.fitness_val += timeMap[point[0],point[1]]
-                self.fitness_val += self.distance_multiplier*self.euclidean_dist(self.coord_list[0],point)
+                self.fitness_val += self.distance_multiplier*start_distance[point]
                 timeMap[point[0],point[1]] = 0
             timeMap += timeStepMap
 
         # print(f"Fitness: ",{self.fitness_val})
-            
+
+        self._fitness_cache = (self.distance_multiplier, self.fitness_val)
         return self.fitness_val
 
     def add_point(self, point: Tuple[int, int]) -> None:
         """Add a new point to the path"""
         self.coord_list.append(point)
 
-    def surveyedNodes(self, point:Tuple[int,int]):
-        xLoc = point[0]
-        yLoc = point[1]
-        surveyedNodes = []
-        
-        for x in range(xLoc-self.vision_radius,xLoc+self.vision_radius+1):
-            for y in range(yLoc-self.vision_radius, yLoc+self.vision_radius+1):
-
-                try:
-                    if (self.warehouse.occupancy_grid[x][y] == False):
-                        node = (x,y)
-                        surveyedNodes.append(node)
-                except IndexError:
-                    pass
-        return surveyedNodes
+    def surveyedNodes(self, point: Tuple[int, int]) -> Tuple[Tuple[int, int], ...]:
+        """Get every free cell the robot can see from a point
+
+        Looked up in the warehouse's precomputed visibility table.
+        """
+        return self.warehouse.visible_nodes(point, self.vision_radius, self.line_of_sight)
         
-    def save_as_gif(self, time: int):
+    def save_as_gif(self, time: int, output: str = "path.gif"):
         """Save the current path as a gif
         
         :param int time: The total time for the gif. Change this depending
             on how long the battery life is and how quickly you want 
             the robot to move
+        :param str output: Where to write the gif
         """
-        # Create all PNGs
-        for i, frame in enumerate(self.coord_list):
-            with open(f"temp_{i}.png", 'wb') as f:
-                w = png.Writer(
-                    len(self.warehouse.occupancy_grid[0]),
-                    len(self.warehouse.occupancy_grid),
-                    greyscale=True
-                )
-                data = self.warehouse.png_write_helper()
-                for b in self.warehouse.bases:
-                    data[b[0]][b[1]] = 127
-                data[frame[0]][frame[1]] = 63
-                w.write(f, data)
-
-        # Load the PNGs
-        frames = []
-        for i in range(self.battery_life):
-            new_frame = Image.open(f"temp_{i}.png")
-            frames.append(new_frame)
-        
-        # Save into a GIF file that loops forever
-        frames[0].save("path.gif", format='GIF',
-                    append_images=frames[1:],
-                    save_all=True,
-                    duration=(time/self.battery_life), loop=0)
+        import render
+        render.save_gif(render.greyscale_frames(self), output, time / self.battery_life)
+
+
+def simulated_annealing(path: Path, cycles: int, k: float = 1.5, show_progress: bool = True):
+    """Anneal a single path, moving one point per cycle
 
-        # Purge temporary PNGs
-        for i in range(self.battery_life):
-            new_frame = os.remove(f"temp_{i}.png") 
+    Moves are made in place and undone when rejected, with their effect
+    on fitness tracked incrementally. See annealing.anneal to anneal
+    whole solutions, over several chains.
 
+    The path's distance_multiplier is used as it is. The original
+    re-weighted it every cycle from the fitness gap between the current
+    path and its mutated copy, but measured that gap before rescoring
+    the copy, when it still held the current path's fitness. The gap was
+    always 0 and the multiplier always 1, so that step was dropped.
 
-def simulated_annealing(path:Path,cycles:int):
+    :param Path path: The path to improve, modified in place
+    :param int cycles: How many moves to try
+    :param float k: The temperature grows by k every cycle
+    :param bool show_progress: Show a progress bar
+
+    :returns:
+        * The annealed path
+        * The coordinates of the path after every accepted move
+    """
     pathEvolutions = []
-    pathEvolutions.append(path.coord_list)
-    bar = Bar('Mutating', max=cycles)
-    k = 1.5
+    pathEvolutions.append(list(path.coord_list))
+    bar = None
+    if show_progress:
+        from progress.bar import Bar
+        bar = Bar('Mutating', max=cycles)
+    scorer = fitness.IncrementalPathFitness(path)
     for i in range(cycles):
-        pMutated = copy.deepcopy(path)
-        pMutated.mutate()
+        index, old, new = path.mutate()
+        delta = scorer.delta(0, index, old, new)
 
-        pMutated.distance_multiplier = math.exp((-1*abs(pMutated.fitness_val-path.fitness_val))/(k*i)) #.01*(i/cycles)
-        pMutated.fitness_func()
-        
+        # Cycles are numbered from 1, so the first temperature isn't 0
+        if delta > 0 or (random.random() > math.exp(-abs(delta) / (k * (i + 1)))):
+            scorer.update(0, index, old, new)
+            pathEvolutions.append(list(path.coord_list))
+        else:
+            path.coord_list[index] = old
 
-        if pMutated.fitness_val>path.fitness_val or (random.random() > math.exp((-1*abs(pMutated.fitness_val-path.fitness_val))/(k*i))):
-            print(pMutated.fitness_val)
-            path = copy.deepcopy(pMutated)
-            pathEvolutions.append(path.coord_list)
-            path.fitness_func()
+        if bar:
+            bar.next()
 
-        bar.next()
-       
-    bar.finish()
+    if bar:
+        bar.finish()
     path.fitness_func()
     return path, pathEvolutions
-    
-def save_multiple_paths_as_gif(time: int, paths: List[Path]) -> None:
-    """Save a list of paths to a single gif"""
-    # Define the color palette for the gif
-    palette = [
-        (0xFF, 0xFF, 0xFF), # white for empty space
-        (0x00, 0x00, 0x00), # black for obstacles
-        (0x77, 0x77, 0x77), # gray for base stations
-        (0xFF, 0x00, 0x00), # red for a robot
-        (0x00, 0x00, 0xFF), # blue for a robot
-        (0x00, 0xFF, 0x00), # green for a robot
-        (0xFF, 0x69, 0x00), # orange for a robot
-        (0x6a, 0x00, 0xFF), # purple for a robot
-        ]
-
-    # Create all PNGs
-    for i, frame in enumerate(paths[0].coord_list):
-        with open(f"temp_{i}.png", 'wb') as f:
-            w = png.Writer(
-                len(paths[0].warehouse.occupancy_grid[0]),
-                len(paths[0].warehouse.occupancy_grid),
-                palette=palette,
-                bitdepth=4
-            )
 
-            # Get data, mapped from 0-1 not 0-255
-            data = paths[0].warehouse.png_write_helper()
-            for y, r in enumerate(data):
-                for x, c in enumerate(r):
-                    data[y][x] = 1 if c == 255 else 0
-
-            color: int = 3 # red is at index 3 in the color palette
-            for path in paths:
-                data[path.base[0]][path.base[1]] = 2 
-                data[path.coord_list[i][0]][path.coord_list[i][1]] = color
-                color += 1
-                if color > 7: color = 3
-            w.write(f, data)
-        scale_up_png(f"temp_{i}.png", 10)
-
-    # Load the PNGs
-    frames = []
-    for i in range(paths[0].battery_life):
-        new_frame = Image.open(f"temp_{i}.png")
-        frames.append(new_frame)
-    
-    # Save into a GIF file that loops forever
-    frames[0].save("path.gif", format='GIF',
-                append_images=frames[1:],
-                save_all=True,
-                duration=(time/paths[0].battery_life), loop=0)
-
-    # Purge temporary PNGs
-    for i in range(paths[0].battery_life):
-        new_frame = os.remove(f"temp_{i}.png") 
-
-
-def path_evolution_gif(evolvedPath, pathList,time):
-
-    """Save a list of paths to a single gif"""
-    # Define the color palette for the gif
-    palette = [
-        (0xFF, 0xFF, 0xFF), # white for empty space
-        (0x00, 0x00, 0x00), # black for obstacles
-        (0x77, 0x77, 0x77), # gray for base stations
-        (0xFF, 0x00, 0x00), # red for a robot
-        (0x00, 0x00, 0xFF), # blue for a robot
-        (0x00, 0xFF, 0x00), # green for a robot
-        (0xFF, 0x69, 0x00), # orange for a robot
-        (0x6a, 0x00, 0xFF), # purple for a robot
-        ]
-   
-    # Create all PNGs
-    for i, path in enumerate(pathList):
-        with open(f"temp_{i}.png", 'wb') as f:
-            w = png.Writer(
-                len(evolvedPath.warehouse.occupancy_grid[0]),
-                len(evolvedPath.warehouse.occupancy_grid),
-                palette=palette,
-                bitdepth=4
-            )
 
-            # Get data, mapped from 0-1 not 0-255
-            data =  evolvedPath.warehouse.png_write_helper()
-            for y, r in enumerate(data):
-                for x, c in enumerate(r):
-                    data[y][x] = 1 if c == 255 else 0
-
-            color: int = 3 # red is at index 3 in the color palette
-
-            for coord in path:
-                data[coord[0]][coord[1]] = 3
-                data[coord[0]][coord[1]] = color
-            w.write(f, data)
-            
-    print("SUCCESFULLY")
-     # Load the PNGs
-    frames = []
-    '''
-    for i in range(len(pathList)):
-        print(i)
-        new_frame = Image.open(f"temp_{i}.png")
-        frames.append(new_frame)
-        #new_frame.close()
-        os.remove(f"temp_{i}.png") 
-    '''
-    for i in range(len(pathList)):
-        img = Image.open(f"temp_{i}.png")
-        frames.append(img.copy())
-        img.close()
-    # Save into a GIF file that loops forever
-    frames[0].save("path2.gif", format='GIF',
-                append_images=frames[1:],
-                save_all=True,
-                duration=(time/evolvedPath.battery_life), loop=0)
-
-    #Purge temporary PNGs
-    for i in range(len(pathList)):
-       os.remove(f"temp_{i}.png") 
+def save_multiple_paths_as_gif(time: int, paths: List[Path], output: str = "path.gif", scale: int = 10) -> None:
+    """Save a list of paths to a single gif
+
+    Frames are drawn in memory and streamed into the encoder.
+
+    :param int time: The total time for the gif
+    :param List[Path] paths: The paths to draw, one robot each
+    :param str output: Where to write the gif
+    :param int scale: How many pixels wide to draw each cell
+    """
+    import render
+    render.save_gif(render.path_frames(paths, scale), output, time / max(p.battery_life for p in paths))
+
+
+def path_evolution_gif(evolvedPath, pathList, time, output: str = "path2.gif"):
+    """Save snapshots of a path evolving to a single gif, one frame per snapshot"""
+    import render
+    render.save_gif(
+        render.evolution_frames(evolvedPath.warehouse, pathList),
+        output,
+        time / evolvedPath.battery_life
+    )
 
 def scale_up_png(filepath: str, scale: int) -> None:
     """Scale up a .png file by a factor of scale"""
-    mat = []
-
-    # Define the color palette for the gif
+    import png
+    import render
 
     with open(filepath, 'rb') as f:
         reader = png.Reader(file=f)
         w, h, data, info = reader.read()
-        for i, line in enumerate(data):
-            # write each line scale times
-            for x in range(scale):
-                mat.append([])
-                for j, pixel in enumerate(line):
-                    # write each pixel scale times
-                    for y in range(scale):
-                        mat[-1].append(pixel)
+        mat = render.scale_up(np.vstack([np.asarray(line) for line in data]), scale)
 
     with open(filepath, 'wb') as f:
         writer = png.Writer(
-            len(mat[0]),
-            len(mat),
+            mat.shape[1],
+            mat.shape[0],
             greyscale=info["greyscale"],
             bitdepth=info["bitdepth"],
-            palette=info["palette"]
+            palette=info.get("palette")
         )
         writer.write(f, mat)
-
-
-    
-      
-
-
-
-
-        
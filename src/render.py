@@ -0,0 +1,166 @@
+# Base python imports
+import io
+import struct
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Sequence, Tuple
+
+# Extended python imports
+import numpy as np
+from PIL import Image
+
+# Project imports
+from utils import Warehouse
+
+if TYPE_CHECKING:
+    from path import Path
+
+# The color palette for path gifs
+PALETTE = [
+    (0xFF, 0xFF, 0xFF), # white for empty space
+    (0x00, 0x00, 0x00), # black for obstacles
+    (0x77, 0x77, 0x77), # gray for base stations
+    (0xFF, 0x00, 0x00), # red for a robot
+    (0x00, 0x00, 0xFF), # blue for a robot
+    (0x00, 0xFF, 0x00), # green for a robot
+    (0xFF, 0x69, 0x00), # orange for a robot
+    (0x6a, 0x00, 0xFF), # purple for a robot
+]
+
+# Palette indices
+WALL = 1
+BASE = 2
+FIRST_ROBOT = 3
+
+
+def base_frame(warehouse: Warehouse) -> np.ndarray:
+    """Get a frame showing only the warehouse, as palette indices"""
+    return np.where(warehouse.free_mask(), 0, WALL).astype(np.uint8)
+
+
+def scale_up(frame: np.ndarray, scale: int) -> np.ndarray:
+    """Scale up a 2D frame by a factor of scale, repeating each pixel"""
+    return np.repeat(np.repeat(frame, scale, axis=0), scale, axis=1)
+
+
+def to_image(frame: np.ndarray, palette: Sequence[Tuple[int, int, int]] = PALETTE) -> Image.Image:
+    """Wrap a frame of palette indices in a PIL image"""
+    image = Image.fromarray(frame)
+    image.putpalette([channel for color in palette for channel in color])
+    return image
+
+
+def path_frames(paths: List["Path"], scale: int = 10) -> Iterator[Image.Image]:
+    """Draw every timestep of a set of paths, one frame at a time
+
+    Robots cycle through the five robot colors in the palette, and
+    each robot's base is drawn in gray. Robots whose paths are shorter
+    stay at their last point.
+    """
+    background = base_frame(paths[0].warehouse)
+    coords = [p.coords() for p in paths]
+    colors = [FIRST_ROBOT + i % (len(PALETTE) - FIRST_ROBOT) for i in range(len(paths))]
+
+    for t in range(max(len(c) for c in coords)):
+        frame = background.copy()
+        for path, c, color in zip(paths, coords, colors):
+            frame[path.base] = BASE
+            frame[tuple(c[min(t, len(c) - 1)])] = color
+        yield to_image(scale_up(frame, scale))
+
+
+def greyscale_frames(path: "Path") -> Iterator[Image.Image]:
+    """Draw every timestep of a single path in greyscale
+
+    Occupied space is 255, bases are 127 and the robot is 63.
+    """
+    background = path.warehouse.greyscale()
+
+    for x, y in path.coord_list:
+        frame = background.copy()
+        frame[x, y] = 63
+        yield Image.fromarray(frame)
+
+
+def evolution_frames(warehouse: Warehouse, path_list: Iterable[Sequence[Tuple[int, int]]], scale: int = 1) -> Iterator[Image.Image]:
+    """Draw one frame per snapshot of a path, showing every point on it"""
+    background = base_frame(warehouse)
+    for path in path_list:
+        frame = background.copy()
+        coords = np.asarray(list(path)).reshape(-1, 2)
+        frame[coords[:, 0], coords[:, 1]] = FIRST_ROBOT
+        yield to_image(scale_up(frame, scale))
+
+
+def _gif_blocks(data: bytes) -> Tuple[bytes, bytes, bytes]:
+    """Split a single frame GIF into its screen header, global color table
+    and image block
+
+    :param bytes data: A GIF file with one frame, as written by Pillow
+
+    :rtype: Tuple[bytes, bytes, bytes]
+    :returns: The signature and logical screen descriptor, the global
+        color table, and the image descriptor through its last data
+        sub-block. Extensions are dropped.
+    """
+    flags = data[10]
+    table_end = 13 + (3 << ((flags & 7) + 1) if flags & 0x80 else 0)
+    i = table_end
+    while data[i:i + 1] == b"!":
+        # Extension: introducer, label, then sub-blocks up to an empty one
+        i += 2
+        while data[i]:
+            i += data[i] + 1
+        i += 1
+    if data[i:i + 1] != b",":
+        raise ValueError("Pillow wrote a GIF without an image block")
+
+    start = i
+    flags = data[i + 9]
+    i += 10 + (3 << ((flags & 7) + 1) if flags & 0x80 else 0)
+    i += 1  # LZW minimum code size
+    while data[i]:
+        i += data[i] + 1
+    return data[:13], data[13:table_end], data[start:i + 1]
+
+
+def save_gif(frames: Iterable[Image.Image], output: str, duration: float) -> None:
+    """Encode frames into a GIF file that loops forever
+
+    The file is written one frame at a time: the header and the first
+    frame's color table once, then each frame's delay and image block as
+    it arrives. Only one frame is held at a time, so memory doesn't grow
+    with the number of frames, and frames can be produced by a generator.
+    A frame whose colors differ from the first frame's carries its own
+    color table.
+
+    :param Iterable[Image.Image] frames: The frames, in order
+    :param str output: The path of the GIF file to write
+    :param float duration: How long to show each frame, in milliseconds
+    """
+    # Delays are stored in hundredths of a second
+    delay = struct.pack("<H", max(0, min(0xFFFF, round(duration / 10))))
+    screen = palette = None
+    with open(output, "wb") as f:
+        for frame in frames:
+            # Let Pillow quantize and compress the frame, then copy out its image block
+            buffer = io.BytesIO()
+            frame.save(buffer, format="GIF", optimize=False)
+            header, table, image = _gif_blocks(buffer.getvalue())
+            del buffer
+
+            if screen is None:
+                screen, palette = header, table
+                f.write(b"GIF89a" + header[6:13] + table)
+                # Loop forever
+                f.write(b"!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+            elif table != palette:
+                # Move this frame's colors into a local color table
+                flags = (image[9] & 0x40) | 0x80 | (header[10] & 7)
+                image = image[:9] + bytes([flags]) + table + image[10:]
+
+            # Graphic control extension: no disposal or transparency, just the delay
+            f.write(b"!\xf9\x04\x00" + delay + b"\x00\x00")
+            f.write(image)
+
+        if screen is None:
+            raise ValueError("No frames to save")
+        f.write(b";")
@@ -0,0 +1,135 @@
+# Base python imports
+import random
+from typing import List, Optional, Tuple
+
+# Project imports
+from evolution import evolve, rank
+from generation import Generation
+from main import generation_factory
+from operators import WalkCache, repair
+from parallel import SerialEvaluator
+from path import Path
+from solution import Solution
+from solve import SolveResult, solve
+from utils import Warehouse
+
+
+def repair_generation(gen: Generation, cache: Optional[WalkCache] = None) -> int:
+    """Make every path of a generation valid again after its warehouse changed
+
+    Each path is rerouted locally around cells that became occupied,
+    see operators.repair, and every cached fitness is reset.
+
+    :param Generation gen: The generation to repair in place
+    :param WalkCache cache: Draws the detours, e.g. a SegmentMutator's
+        cache. Defaults to a new one.
+
+    :rtype: int
+    :returns: The number of points that moved, over all paths
+    """
+    warehouse = gen.solutions[0].paths[0].warehouse
+    cache = cache or WalkCache(warehouse)
+    return sum(repair(p, cache) for s in gen.solutions for p in s.paths)
+
+
+def reseed(gen: Generation, share: float, evaluator: Optional[SerialEvaluator] = None) -> int:
+    """Replace the worst solutions of a generation with new random ones
+
+    A converged population can depend on a corridor that was just
+    blocked, with no single mutation leading out of the detour. New
+    solutions bring back the variety it needs to find another route,
+    while the best repaired solutions are kept.
+
+    :param Generation gen: The generation to reseed in place, ranked first
+    :param float share: The share of solutions to replace, between 0 and 1
+    :param SerialEvaluator evaluator: How to rank the generation, see evolve()
+
+    :rtype: int
+    :returns: The number of solutions replaced
+    """
+    count = min(int(share * len(gen.solutions)), len(gen.solutions) - 1)
+    if count <= 0:
+        return 0
+    rank(gen, evaluator)
+    for i in range(len(gen.solutions) - count, len(gen.solutions)):
+        gen.solutions[i] = Solution([
+            Path(
+                p.warehouse, p.base, p.battery_life, p.vision_radius,
+                line_of_sight=p.line_of_sight, distance_metric=p.distance_metric
+            )
+            for p in gen.solutions[i].paths
+        ])
+    return count
+
+
+def replan(
+    gen: Generation,
+    blocked: List[Tuple[int, int]] = (),
+    unblocked: List[Tuple[int, int]] = (),
+    fresh: float = 0.5,
+    **kwargs
+) -> SolveResult:
+    """Update the warehouse a generation lives in, and continue evolving it
+
+    The warehouse's cached tables are updated around the changed cells,
+    see Warehouse.apply_diff, and the generation is repaired in place
+    rather than started over. The best repaired solutions are kept, and
+    the rest replaced with random ones. After a small change most of
+    each solution still applies, so a short budget is usually enough to
+    match a full solve on the new layout.
+
+    :param Generation gen: The current population, e.g. from a previous
+        solve. Its paths are repaired in place.
+    :param List[Tuple[int, int]] blocked: Cells that are now occupied
+    :param List[Tuple[int, int]] unblocked: Cells that are now free
+    :param float fresh: The share of the worst repaired solutions to
+        replace with new random ones, see reseed
+    :param kwargs: Budgets and operators, see solve.solve_iter. Use a
+        SerialEvaluator or a new ProcessPoolEvaluator, since workers
+        started before the change keep the old layout.
+
+    :rtype: SolveResult
+    """
+    warehouse: Warehouse = gen.solutions[0].paths[0].warehouse
+    warehouse.apply_diff(blocked, unblocked)
+
+    mutator = kwargs.get("mutator")
+    repair_generation(gen, getattr(mutator, "cache", None))
+    reseed(gen, fresh, kwargs.get("evaluator"))
+    return solve(gen, **kwargs)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    def cell(text: str) -> Tuple[int, int]:
+        row, col = text.split(",")
+        return int(row), int(col)
+
+    parser = argparse.ArgumentParser(description="Solve, change the warehouse, then re-plan from the same population")
+    parser.add_argument("warehouse")
+    parser.add_argument("--battery", type=int, default=30)
+    parser.add_argument("--population", type=int, default=12)
+    parser.add_argument("--block", type=cell, nargs="*", default=[], help="Cells to block, as row,column")
+    parser.add_argument("--unblock", type=cell, nargs="*", default=[], help="Cells to clear, as row,column")
+    parser.add_argument("--cycles", type=int, default=500, help="Cycles for the first solve")
+    parser.add_argument("--replan-cycles", type=int, default=100, help="Cycles for the re-plan")
+    parser.add_argument("--fresh", type=float, default=0.5,
+                        help="Share of the population to replace with new random solutions")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    # A solve only returns its best solution, so evolve the population directly
+    if args.seed is not None:
+        random.seed(args.seed)
+    w = Warehouse(args.warehouse)
+    gen = evolve(generation_factory(w, args.battery, args.population), args.cycles, render=False)
+    # evolve returns the last bred generation, which isn't scored or sorted yet
+    rank(gen)
+    print(f"Before the change: {gen.solutions[0].fitness_val}")
+
+    result = replan(gen, args.block, args.unblock, args.fresh, max_cycles=args.replan_cycles, patience=None)
+    print(
+        f"After the change: {result.fitness} after {result.cycles} cycles, "
+        f"{result.evaluations} evaluations and {result.elapsed:.3f}s"
+    )
@@ -1,48 +1,52 @@
 # Base python imports
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 # Extended python imports
 import numpy as np
 
 # Project imports
 from path import Path
+import fitness
 
 class Solution:
     def __init__(self, paths: List[Path]):
         self.paths = paths
         self.fitness_val = 0
+        # The keys of the paths the cached fitness was computed from
+        self._cache_key: Optional[Tuple[int, ...]] = None
+        # Each robot's share of the cached fitness
+        self._contributions: Optional[fitness.Contributions] = None
 
     def copy(self):
-        return Solution([p.copy() for p in self.paths])
+        out = Solution([p.copy() for p in self.paths])
+        out.fitness_val = self.fitness_val
+        out._cache_key = self._cache_key
+        out._contributions = self._contributions
+        return out
+
+    def to_cells(self) -> List[np.ndarray]:
+        """Get the cell id array of every path, a compact encoding of the solution"""
+        return [p.cells for p in self.paths]
+
+    def with_cells(self, cells: List[np.ndarray]) -> "Solution":
+        """Build a solution with the same robots as this one, following new paths
+
+        :param List[np.ndarray] cells: One cell id array per path, see to_cells()
+        """
+        out = self.copy()
+        for path, c in zip(out.paths, cells):
+            path.cells = c
+        return out
+
+    def partials(self) -> List[fitness.PathPartial]:
+        """Get every path's (cached) contribution to the fitness"""
+        return [p.partial() for p in self.paths]
 
     def surveillance_score(self) -> int:
         """Return the portion of the fitness function corresponding
         to how well the robots are surveiling
         """
-        # Initialize output variable
-        out = 0
-
-        # Pull out a few useful variables for later
-        warehouse = self.paths[0].warehouse
-        grid = warehouse.occupancy_grid
-
-        # Initialize warehouse grid score matrices
-        # 0's where a wall is located, 1's in empty space
-        def row(i): return [int(not b) for b in grid[i]]
-    
-        # use arrays for 2D array addition
-        time_step_map = np.array([row(i) for i in range(len(grid))]) 
-        time_map = np.copy(time_step_map)
-        
-        # Iterate over the path, step by step
-        for ts in range(len(self.paths[0].coord_list)):
-
-            # For each point that any robot is looking at during the current timestep
-            for y, x in self.surveyed_nodes(ts):
-                out += time_map[y][x]
-                time_map[y][x] = 0
-            time_map += time_step_map
-            
+        out = fitness.surveillance_score(self.partials())
         self.fitness_val = out
         return out
 
@@ -51,9 +55,10 @@ class Solution:
         # Initialize output list
         out = []
 
-        # Append all visible points
+        # Append all visible points, from robots still running
         for path in self.paths:
-            out.extend(path.surveyedNodes(path.coord_list[time]))
+            if time < len(path.coord_list):
+                out.extend(path.surveyedNodes(path.coord_list[time]))
     
         # Remove duplicates
         return list(set(out))
@@ -62,20 +67,77 @@ class Solution:
         """Get the component of the fitness function that
         encourages robots to venture away from their bases
         """
-        coef = 10
-        out = 0.0
+        return fitness.distance_score(self.partials(), coef=10)
 
-        # Iterate over the paths, step by step
-        for ts in range(len(self.paths[0].coord_list)):
-            for path in self.paths:
-                # Add the distance between the robot and its base
-                out += coef * path.euclidean_dist(path.base, path.coord_list[ts])
+    def fitness_func(self) -> float:
+        """Evaluate a solution's fitness, store and return it
 
-        return out
+        The result is cached until one of the paths changes, or is
+        swapped for another path. See evaluate_population to score many
+        solutions at once.
+        """
+        return evaluate_population([self])[0]
 
-    def fitness_func(self) -> float:
-        """Evaluate a solution's fitness, store and return it"""
-        self.fitness_val = self.surveillance_score() + self.distance_score()
-        return self.fitness_val
+    @property
+    def is_scored(self) -> bool:
+        """Whether the cached fitness still matches the paths"""
+        return tuple(p.key for p in self.paths) == self._cache_key
 
+    def contributions(self) -> fitness.Contributions:
+        """Get each robot's share of the fitness, see fitness.Contributions
 
+        They are computed along with the fitness, and cached with it.
+
+        :rtype: fitness.Contributions
+        :returns: Arrays with one entry per robot
+        """
+        self.fitness_func()
+        return self._contributions
+
+    def _store_fitness(self, value: float, contributions: fitness.Contributions) -> None:
+        self.fitness_val = value
+        self._cache_key = tuple(p.key for p in self.paths)
+        self._contributions = contributions
+
+
+def evaluate_population(solutions: List[Solution]) -> List[float]:
+    """Evaluate (or look up) the fitness of many solutions at once
+
+    Solutions with cached fitness are skipped. The rest are grouped by
+    robot setup (bases, battery lives and vision), and each group is scored
+    in vectorized windows of timesteps, see fitness.windowed_scores. Solutions
+    whose paths already carry their partial results, e.g. from a
+    ProcessPoolEvaluator, just combine them.
+
+    :rtype: List[float]
+    :returns: The fitness of each solution, in order
+    """
+    groups: Dict[Tuple, List[Solution]] = {}
+    for s in solutions:
+        if s.is_scored:
+            fitness.stats.solution_hits += 1
+            continue
+        fitness.stats.solution_misses += 1
+
+        vision = {(p.vision_radius, p.line_of_sight, p.distance_metric) for p in s.paths}
+        if all(p.is_scored for p in s.paths) or len(vision) != 1:
+            # Combine cached partials, or settings that differ between robots
+            partials = s.partials()
+            s._store_fitness(
+                fitness.surveillance_score(partials) + fitness.distance_score(partials, coef=10),
+                fitness.partial_contributions(partials, coef=10)
+            )
+            continue
+
+        signature = (tuple(p.base for p in s.paths), vision.pop(), tuple(len(p.cells) for p in s.paths))
+        groups.setdefault(signature, []).append(s)
+
+    for (bases, (radius, line_of_sight, metric), _), group in groups.items():
+        surveillance, distance, contributions = fitness.windowed_scores(
+            group[0].paths[0].warehouse, [s.to_cells() for s in group], list(bases),
+            radius, line_of_sight, metric, coef=10
+        )
+        for i, (s, a, b) in enumerate(zip(group, surveillance.tolist(), distance.tolist())):
+            s._store_fitness(a + b, fitness.Contributions(*(c[i] for c in contributions)))
+
+    return [s.fitness_val for s in solutions]
@@ -0,0 +1,206 @@
+# Base python imports
+import random
+import time
+from typing import Callable, Generator, NamedTuple, Optional, Sequence, Union
+
+# Project imports
+from evolution import breed, rank
+from generation import Generation
+from instrument import NULL_INSTRUMENT, Instrument
+from main import generation_factory
+from parallel import SerialEvaluator
+from path import Path, save_multiple_paths_as_gif
+from solution import Solution
+from utils import Warehouse
+import fitness
+
+
+class Improvement(NamedTuple):
+    """A new best solution, found during a solve"""
+    # A copy of the solution, safe to keep while the solve goes on
+    solution: Solution
+    fitness: float
+    # The cycle it was found in, 0 for the initial population
+    cycle: int
+    # Solutions evaluated since the solve started
+    evaluations: int
+    # Seconds since the solve started
+    elapsed: float
+
+
+class SolveResult(NamedTuple):
+    """The outcome of a solve"""
+    # The best solution found
+    solution: Solution
+    fitness: float
+    # Cycles run, not counting scoring the initial population
+    cycles: int
+    evaluations: int
+    elapsed: float
+    # Why the solve stopped: "time", "evaluations", "stagnation" or "cycles"
+    stopped: str
+
+
+def solve_iter(
+    initial: Union[Warehouse, Generation],
+    batt: Union[int, Sequence[int]] = 30,
+    population: int = 12,
+    time_budget: Optional[float] = None,
+    evaluation_budget: Optional[int] = None,
+    max_cycles: Optional[int] = None,
+    patience: Optional[int] = 200,
+    tolerance: float = 0.0,
+    seed: Optional[int] = None,
+    evaluator: Optional[SerialEvaluator] = None,
+    mutator: Optional[Callable[[Path], object]] = None,
+    crossover: Optional[Callable[[Generation, int, int], None]] = None,
+    instrument: Optional[Instrument] = None
+) -> Generator[Improvement, None, SolveResult]:
+    """Evolve solutions until a budget runs out, yielding every new best
+
+    The first improvement is the best of the initial population. Budgets
+    are checked after every cycle, so a solve may overrun its time budget
+    by up to one cycle.
+
+    :param initial: A warehouse to start from random solutions in, or a
+        generation to continue evolving, e.g. a previous solve's population
+    :param batt: The robots' battery life, when starting from a warehouse,
+        see main.solution_factory
+    :param int population: The number of solutions, when starting from a warehouse
+    :param float time_budget: Stop after this many seconds
+    :param int evaluation_budget: Stop after evaluating this many solutions
+    :param int max_cycles: Stop after this many cycles
+    :param int patience: Stop after this many cycles without improving
+        the best fitness by more than tolerance. None never stops early.
+    :param float tolerance: The smallest gain in fitness that counts as
+        an improvement, for patience
+    :param int seed: Seed the random number generator first
+    :param SerialEvaluator evaluator: How to score each generation, see evolve()
+    :param mutator: How to mutate paths, see evolve()
+    :param crossover: How to cross over solutions, see evolve()
+    :param Instrument instrument: Time each phase of every cycle, see evolve()
+
+    :rtype: Generator[Improvement, None, SolveResult]
+    :returns: Yields each new best solution, and returns a SolveResult
+        when done
+    """
+    if time_budget is None and evaluation_budget is None and max_cycles is None and patience is None:
+        raise ValueError("A solve needs a time budget, an evaluation budget, a cycle limit or patience")
+
+    started = time.perf_counter()
+    evaluations = fitness.stats.solution_misses
+    evaluator = evaluator or SerialEvaluator()
+    instrument = instrument or NULL_INSTRUMENT
+
+    if seed is not None:
+        random.seed(seed)
+    if isinstance(initial, Warehouse):
+        curr = generation_factory(initial, batt, population)
+    else:
+        curr = initial.copy()
+
+    rank(curr, evaluator, instrument)
+    best = curr.solutions[0].copy()
+    yield Improvement(best, best.fitness_val, 0, fitness.stats.solution_misses - evaluations, time.perf_counter() - started)
+
+    cycle = 0
+    last_improvement = 0
+    while True:
+        elapsed = time.perf_counter() - started
+        spent = fitness.stats.solution_misses - evaluations
+        if time_budget is not None and elapsed >= time_budget:
+            stopped = "time"
+        elif evaluation_budget is not None and spent >= evaluation_budget:
+            stopped = "evaluations"
+        elif max_cycles is not None and cycle >= max_cycles:
+            stopped = "cycles"
+        elif patience is not None and cycle - last_improvement >= patience:
+            stopped = "stagnation"
+        else:
+            stopped = None
+        if stopped:
+            return SolveResult(best, best.fitness_val, cycle, spent, elapsed, stopped)
+
+        cycle += 1
+        curr = breed(curr, mutator, instrument, crossover)
+        rank(curr, evaluator, instrument)
+        instrument.end_cycle(cycle)
+
+        leader = curr.solutions[0]
+        if leader.fitness_val > best.fitness_val:
+            if leader.fitness_val > best.fitness_val + tolerance:
+                last_improvement = cycle
+            best = leader.copy()
+            yield Improvement(
+                best, best.fitness_val, cycle,
+                fitness.stats.solution_misses - evaluations, time.perf_counter() - started
+            )
+
+
+def solve(
+    initial: Union[Warehouse, Generation],
+    batt: Union[int, Sequence[int]] = 30,
+    callback: Optional[Callable[[Improvement], None]] = None,
+    render: Optional[str] = None,
+    **kwargs
+) -> SolveResult:
+    """Find the best solution possible within a budget
+
+    For example, solve(warehouse, 30, time_budget=2) returns the best
+    plan found in two seconds, or sooner if fitness stops improving.
+
+    :param initial: A warehouse, or a generation to continue evolving
+    :param batt: The robots' battery life, see solve_iter
+    :param callback: Called with every Improvement as it is found
+    :param str render: Save the best solution as a gif here. Nothing is
+        rendered by default.
+    :param kwargs: Budgets and operators, see solve_iter
+
+    :rtype: SolveResult
+    """
+    improvements = solve_iter(initial, batt, **kwargs)
+    while True:
+        try:
+            improvement = next(improvements)
+        except StopIteration as done:
+            result: SolveResult = done.value
+            break
+        if callback is not None:
+            callback(improvement)
+
+    if render:
+        save_multiple_paths_as_gif(10, result.solution.paths, output=render)
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Find the best patrol possible within a budget")
+    parser.add_argument("warehouse")
+    parser.add_argument("--battery", type=int, default=30)
+    parser.add_argument("--population", type=int, default=12)
+    parser.add_argument("--time", type=float, default=None, help="Time budget, in seconds")
+    parser.add_argument("--evaluations", type=int, default=None, help="Evaluation budget")
+    parser.add_argument("--cycles", type=int, default=None, help="Cycle limit")
+    parser.add_argument("--patience", type=int, default=200,
+                        help="Stop after this many cycles without improvement, 0 to never stop early")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--gif", help="Save the best solution as a gif here")
+    args = parser.parse_args()
+
+    result = solve(
+        Warehouse(args.warehouse), args.battery,
+        callback=lambda i: print(f"{i.elapsed:8.3f}s cycle {i.cycle:6d}: {i.fitness}"),
+        render=args.gif,
+        population=args.population,
+        time_budget=args.time,
+        evaluation_budget=args.evaluations,
+        max_cycles=args.cycles,
+        patience=args.patience or None,
+        seed=args.seed,
+    )
+    print(
+        f"Best fitness: {result.fitness} after {result.cycles} cycles, "
+        f"{result.evaluations} evaluations and {result.elapsed:.3f}s (stopped on {result.stopped})"
+    )
@@ -1,97 +1,642 @@
 # Base python
-from typing import Tuple, List
+import hashlib
+import logging
+import os
+from typing import Dict, Tuple, List, Optional, Union
 
 # Extended Python
-import png
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Where a path point can move, relative to its current position: staying
+# put, down, up, right and left, in the order Path.get_neighbors uses
+MIDDLE_OFFSETS = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1))
+
 
 class Warehouse:
     """A small utility class to hold information about the warehouse we are opperating in"""
 
-    def __init__(self, file_path: str):
-        if ".txt" in file_path:
-            self.occupancy_grid, self.bases = self.load_warehouse_from_txt(file_path)
+    def __init__(self, file_path: str, cache_dir: Optional[str] = None):
+        """Load a warehouse from a .txt or .png file
+
+        :param str file_path: The floor plan, see load_warehouse_from_txt
+            and load_warehouse_from_png for the formats
+        :param str cache_dir: If set, the parsed grid is saved here as a
+            binary file, and later loads of the same, unchanged, floor plan
+            memory map it instead of parsing it again. Distance tables
+            are cached here too.
+        """
+        cached = self._load_cached_grid(file_path, cache_dir) if cache_dir else None
+        if cached is not None:
+            occupancy_grid, bases = cached
+        elif ".txt" in file_path:
+            occupancy_grid, bases = self.load_warehouse_from_txt(file_path)
         elif ".png" in file_path:
-            self.occupancy_grid, self.bases = self.load_warehouse_from_png(file_path)
+            occupancy_grid, bases = self.load_warehouse_from_png(file_path)
         else:
             raise Exception("Warehouse must be defined in a txt or png file")
 
-        print(self.bases)
+        if cache_dir and cached is None:
+            self._save_cached_grid(file_path, cache_dir, occupancy_grid, bases)
+
+        self._setup(occupancy_grid, bases)
+        self.cache_dir = cache_dir
+
+    @classmethod
+    def from_grid(cls, occupancy_grid: Union[np.ndarray, List[List[bool]]], bases: List[Tuple[int, int]]) -> "Warehouse":
+        """Build a warehouse from an occupancy grid rather than a file
+
+        :param occupancy_grid: True spaces are occupied, False spaces can
+            be traveled through. Short rows are padded with occupied space.
+        :param List[Tuple[int, int]] bases: The robots' charging stations
+        """
+        out = cls.__new__(cls)
+        out._setup(occupancy_grid, bases)
+        return out
+
+    def _setup(self, occupancy_grid: Union[np.ndarray, List[List[bool]]], bases: List[Tuple[int, int]]) -> None:
+        if not isinstance(occupancy_grid, np.ndarray):
+            occupancy_grid = pad_rows(occupancy_grid)
+
+        # A read only (rows, columns) bool array, True where occupied
+        self.occupancy_grid: np.ndarray = occupancy_grid.astype(bool, copy=False)
+        if self.occupancy_grid.flags.writeable:
+            self.occupancy_grid = self.occupancy_grid.copy()
+            self.occupancy_grid.flags.writeable = False
+        self.bases = bases
+
+        self._shape = self.occupancy_grid.shape
+        self._free: Optional[np.ndarray] = None
+        self._greyscale: Optional[np.ndarray] = None
+
+        # Visibility tables and node lists, keyed by (vision_radius, line_of_sight)
+        self._visibility: Dict[Tuple[int, bool], np.ndarray] = {}
+        self._visible_nodes: Dict[Tuple[int, bool], List[Tuple[Tuple[int, int], ...]]] = {}
 
-    def load_warehouse_from_txt(self, path: str) -> Tuple[List[List[bool]], List[Tuple[int, int]]]:
+        # Distance fields keyed by (metric, source), and all pairs distances
+        self._distance_fields: Dict[Tuple[str, Tuple[int, int]], np.ndarray] = {}
+        self._all_pairs: Optional[np.ndarray] = None
+        self._hash: Optional[str] = None
+
+        # Legal single point detours, see mutation_table
+        self._mutation_table: Optional[np.ndarray] = None
+        self._mutation_bytes = b""
+        self._middles: List[Tuple[int, ...]] = []
+
+        # If set, distance tables are also saved to and loaded from here
+        self.cache_dir: Optional[str] = None
+
+        # Counts the changes made by apply_diff, so caches built elsewhere
+        # from this warehouse can tell when they are stale
+        self.revision = 0
+
+        logger.debug("Loaded a %dx%d warehouse with bases at %s", *self._shape, self.bases)
+
+    def load_warehouse_from_txt(self, path: str) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
         """Given a path to a warehouse file, load it and return the useful information.
 
         :param str path: The path (hopefully absolute) to the .txt file representing the warehouse.
-            See warehouse.txt for an example. A robot starts at A and ends at B.
+            See warehouse.txt for an example. X is occupied, spaces are free and
+            B marks a robot's base. Short lines are padded with occupied space.
 
         :returns:
-            * A 2D list of booleans; True spaces are occupied, False spaces can be traveled through.
-            * A base point for a single robot
-        """
-        occupancy_grid: List[List[bool]] = []
-        bases: List[tuple] = []
-
-        with open(path) as f:
-            for i, line in enumerate(f.readlines()):
-                occupancy_grid.append([])
-                for j, char in enumerate(line):
-                    if char == "X":
-                        occupancy_grid[i].append(True)
-                    elif char == " ":
-                        occupancy_grid[i].append(False)
-                    elif char == "B":
-                        occupancy_grid[i].append(False)
-                        bases.append((i, j))
+            * A 2D bool array; True spaces are occupied, False spaces can be traveled through.
+            * The robots' bases, in reading order
+        """
+        with open(path, "rb") as f:
+            lines = f.read().splitlines()
+
+        width = max((len(line) for line in lines), default=0)
+        chars = np.frombuffer(b"".join(line.ljust(width, b"X") for line in lines), dtype=np.uint8)
+        chars = chars.reshape(len(lines), width)
 
+        occupancy_grid = (chars != ord(" ")) & (chars != ord("B"))
+        bases = [(int(i), int(j)) for i, j in np.argwhere(chars == ord("B"))]
         return occupancy_grid, bases
 
-    def load_warehouse_from_png(self, path: str) -> Tuple[List[List[bool]], Tuple[int, int], Tuple[int, int]]:
+    def load_warehouse_from_png(self, path: str) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
         """Given a path to a PNG, load a warehouse.
 
-        Expect obstacles in black, empty space in white, and robot charging
-        stations in red
+        Expect a greyscale image with obstacles in white (255), empty
+        space in black (0), and robot charging stations in any other shade
         """
-        occupancy_grid: List[List[bool]] = []
-        bases: List[Tuple[int, int]] = []
+        import png
 
         with open(path, 'rb') as f:
             reader = png.Reader(file=f)
             w, h, data, info = reader.read()
+            pixels = np.vstack([np.asarray(row) for row in data]).reshape(h, -1)
 
-            for i, line in enumerate(data):
-                occupancy_grid.append([])
-                for j, val in enumerate(line):
-                    if val == 255:
-                        occupancy_grid[i].append(True)
-                    elif val == 0:
-                        occupancy_grid[i].append(False)
-                    else:
-                        occupancy_grid[i].append(False)
-                        bases.append((i, j))
+        occupancy_grid = pixels == 255
+        bases = [(int(i), int(j)) for i, j in np.argwhere((pixels != 255) & (pixels != 0))]
+        return occupancy_grid, bases
+
+    @staticmethod
+    def _grid_cache_file(file_path: str, cache_dir: str) -> str:
+        """Name the cached grid after the floor plan's path, size and modification time"""
+        st = os.stat(file_path)
+        key = f"{os.path.abspath(file_path)}:{st.st_size}:{st.st_mtime_ns}"
+        return os.path.join(cache_dir, "grids", hashlib.sha1(key.encode()).hexdigest())
 
-            return occupancy_grid, bases
+    def _load_cached_grid(self, file_path: str, cache_dir: str) -> Optional[Tuple[np.ndarray, List[Tuple[int, int]]]]:
+        name = self._grid_cache_file(file_path, cache_dir)
+        if not os.path.exists(f"{name}.grid.npy"):
+            return None
+        bases = [(int(i), int(j)) for i, j in np.load(f"{name}.bases.npy")]
+        return np.load(f"{name}.grid.npy", mmap_mode="r"), bases
+
+    def _save_cached_grid(self, file_path: str, cache_dir: str, grid: np.ndarray, bases: List[Tuple[int, int]]) -> None:
+        name = self._grid_cache_file(file_path, cache_dir)
+        os.makedirs(os.path.dirname(name), exist_ok=True)
+        # Bases first, the grid file marks the cache entry as complete
+        for suffix, array in (("bases", np.asarray(bases, dtype=np.int64).reshape(-1, 2)), ("grid", grid)):
+            tmp = f"{name}.{os.getpid()}.tmp.npy"
+            np.save(tmp, array)
+            os.replace(tmp, f"{name}.{suffix}.npy")
 
     def png_write_helper(self) -> List[List[int]]:
-        out = []
-        for line in self.occupancy_grid:
-            row = []
-            out.append(row)
-            for j in line:
-                row.append(j * 255)
-        return out
+        """Get the occupancy grid as nested lists, 255 where occupied and 0 where free"""
+        return (self.occupancy_grid * 255).tolist()
+
+    def greyscale(self) -> np.ndarray:
+        """Get (and cache) the warehouse as a greyscale image
+
+        :rtype: np.ndarray
+        :returns: A read only uint8 array; occupied space is 255, free
+            space 0 and bases 127
+        """
+        if self._greyscale is None:
+            image = np.where(self.occupancy_grid, 255, 0).astype(np.uint8)
+            for b in self.bases:
+                image[b] = 127
+            image.flags.writeable = False
+            self._greyscale = image
+        return self._greyscale
 
     def write_warehouse_to_png(self, path: str) -> None:
         """Given a warehouse, create a .png file to represent it
         
-        Black pixels are occupied space, white pixels are free
+        White pixels are occupied space, black pixels are free, and grey
+        pixels are bases
         """
+        import png
+
+        h, w = self._shape
         with open(path, 'wb') as f:
-            w = png.Writer(
-                len(self.occupancy_grid[0]),
-                len(self.occupancy_grid),
-                greyscale=True
-            )
-            data = self.png_write_helper()
-            for b in self.bases:
-                data[b[0]][b[1]] = 127
-            w.write(f, data)
+            png.Writer(w, h, greyscale=True).write(f, self.greyscale())
+
+
+    def write_warehouse_to_txt(self, path: str) -> None:
+        """Given a warehouse, create a .txt file to represent it
+
+        Occupied space is written as X, free space as a space, and
+        bases as B, the format load_warehouse_from_txt reads.
+        """
+        chars = np.where(self.occupancy_grid, ord("X"), ord(" ")).astype(np.uint8)
+        for b in self.bases:
+            chars[b] = ord("B")
+        with open(path, "w") as f:
+            f.write("\n".join(row.tobytes().decode() for row in chars))
+
+    def __getstate__(self):
+        # Visibility tables travel with the warehouse, so worker
+        # processes never rebuild them. Cached node tuples are cheap
+        # to recreate and expensive to pickle.
+        state = self.__dict__.copy()
+        state["_visible_nodes"] = {}
+        return state
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """The (rows, columns) size of the warehouse"""
+        return self._shape
+
+    def free_mask(self) -> np.ndarray:
+        """Get (and cache) a read only 2D boolean array, True wherever
+        the warehouse is empty
+        """
+        if self._free is None:
+            self._free = ~self.occupancy_grid
+            self._free.flags.writeable = False
+        return self._free
+
+    def apply_diff(
+        self,
+        blocked: List[Tuple[int, int]] = (),
+        unblocked: List[Tuple[int, int]] = ()
+    ) -> np.ndarray:
+        """Block or clear cells in place, e.g. when a rack moves
+
+        Only the cached tables that depend on the changed cells are
+        updated: rows of the visibility tables within each vision radius
+        of a change, and rows of the mutation table next to one.
+        Euclidean distance fields don't depend on the layout and are kept.
+        Geodesic distance fields and all pairs distances can change
+        anywhere, so they are dropped and rebuilt when next used.
+
+        Paths planned before the change may now cross occupied cells,
+        and their cached fitness is stale, see operators.repair.
+        Worker processes keep their own copy of the warehouse, so start
+        a new ProcessPoolEvaluator after a change.
+
+        :param List[Tuple[int, int]] blocked: Cells that are now occupied
+        :param List[Tuple[int, int]] unblocked: Cells that are now free
+
+        :rtype: np.ndarray
+        :returns: The ids of the cells that changed, row * width + column
+        """
+        h, w = self._shape
+        grid = self.occupancy_grid.copy()
+        for cells, value in ((blocked, True), (unblocked, False)):
+            for r, c in cells:
+                if not (0 <= r < h and 0 <= c < w):
+                    raise ValueError(f"Cell {(r, c)} is outside the {h}x{w} warehouse")
+                if value and (r, c) in self.bases:
+                    raise ValueError(f"Cannot block the base at {(r, c)}")
+                grid[r, c] = value
+
+        changed = np.flatnonzero(grid != self.occupancy_grid)
+        if not len(changed):
+            return changed
+
+        grid.flags.writeable = False
+        self.occupancy_grid = grid
+        self._free = None
+        self._greyscale = None
+        self._hash = None
+        self.revision += 1
+
+        def near(radius: int) -> np.ndarray:
+            """Every cell id at most radius rows and columns from a change"""
+            rows, cols = np.divmod(changed, w)
+            offsets = np.arange(-radius, radius + 1)
+            rows = (rows[:, None, None] + offsets[None, :, None]).repeat(len(offsets), axis=2)
+            cols = (cols[:, None, None] + offsets[None, None, :]).repeat(len(offsets), axis=1)
+            ok = (rows >= 0) & (rows < h) & (cols >= 0) & (cols < w)
+            return np.unique(rows[ok] * w + cols[ok])
+
+        # Lines of sight from a cell only pass through its own window,
+        # so no other row of a visibility table can change
+        for key, table in self._visibility.items():
+            rows = near(key[0])
+            table = table.copy()
+            table[rows] = self._build_visibility_table(*key, rows)
+            table.flags.writeable = False
+            self._visibility[key] = table
+            nodes = self._visible_nodes.get(key)
+            if nodes is not None:
+                for cell in rows.tolist():
+                    nodes[cell] = None
+
+        if self._mutation_table is not None:
+            rows = near(1)
+            table = self._mutation_table.copy()
+            table[rows] = self._build_mutation_rows(rows)
+            table.flags.writeable = False
+            self._mutation_table = table
+            self._mutation_bytes = table.tobytes()
+
+        self._distance_fields = {k: v for k, v in self._distance_fields.items() if k[0] == "euclidean"}
+        self._all_pairs = None
+
+        logger.debug("Changed %d cells, warehouse revision %d", len(changed), self.revision)
+        return changed
+
+    def visibility_table(self, vision_radius: int = 1, line_of_sight: bool = False) -> np.ndarray:
+        """Get (and build once) the visibility table for a vision radius
+
+        Cells are identified by their flat id, row * width + column.
+        Row i of the table lists the ids of every free cell visible from
+        cell i, padded with -1. Cells outside the warehouse are never
+        visible.
+
+        :param int vision_radius: How far a robot can see, in each direction
+        :param bool line_of_sight: If True, occupied space blocks vision
+
+        :rtype: np.ndarray
+        :returns: A read only (rows * columns, (2r + 1)^2) int32 array
+        """
+        key = (vision_radius, line_of_sight)
+        if key not in self._visibility:
+            self._visibility[key] = self._build_visibility_table(vision_radius, line_of_sight)
+        return self._visibility[key]
+
+    def _build_visibility_table(
+        self,
+        vision_radius: int,
+        line_of_sight: bool,
+        cells: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Build the visibility table, or only its rows for some cell ids"""
+        free = self.free_mask()
+        h, w = free.shape
+        if cells is None:
+            cells = np.arange(h * w)
+        rows, cols = np.divmod(cells, w)
+
+        r = range(-vision_radius, vision_radius + 1)
+        offsets = [(dx, dy) for dx in r for dy in r]
+        table = np.full((len(cells), len(offsets)), -1, dtype=np.int32)
+
+        def lookup(dx: int, dy: int) -> np.ndarray:
+            """Which cells have free space at the given offset"""
+            x = rows + dx
+            y = cols + dy
+            ok = (x >= 0) & (x < h) & (y >= 0) & (y < w)
+            ok[ok] = free[x[ok], y[ok]]
+            return ok
+
+        for k, (dx, dy) in enumerate(offsets):
+            visible = lookup(dx, dy)
+            if line_of_sight:
+                for bx, by in bresenham((0, 0), (dx, dy))[1:-1]:
+                    visible &= lookup(bx, by)
+            table[visible, k] = (rows[visible] + dx) * w + cols[visible] + dy
+
+        table.flags.writeable = False
+        return table
+
+    def visible_nodes(
+        self,
+        point: Tuple[int, int],
+        vision_radius: int = 1,
+        line_of_sight: bool = False
+    ) -> Tuple[Tuple[int, int], ...]:
+        """Get every free cell visible from a point, as coordinates
+
+        Results are cached per cell, so repeated lookups don't allocate.
+        """
+        key = (vision_radius, line_of_sight)
+        nodes = self._visible_nodes.get(key)
+        if nodes is None:
+            nodes = self._visible_nodes[key] = [None] * (self._shape[0] * self._shape[1])
+
+        w = self._shape[1]
+        cell = point[0] * w + point[1]
+        out = nodes[cell]
+        if out is None:
+            row = self.visibility_table(vision_radius, line_of_sight)[cell]
+            out = nodes[cell] = tuple(divmod(int(c), w) for c in row if c >= 0)
+        return out
+
+
+    def mutation_table(self) -> np.ndarray:
+        """Get (and build once) the legal detours between nearby cells
+
+        A path point can move to any free cell that is a neighbor of
+        (or equal to) both the points before and after it. For each cell
+        a and each of the 9 cells b at most one step away, including
+        diagonally, the table holds a bitmask of the valid middle cells:
+        bit j is set if a + MIDDLE_OFFSETS[j] is free and next to b.
+
+        :rtype: np.ndarray
+        :returns: A read only (rows * columns, 9) uint8 array, indexed by
+            a's cell id and 3 * (row(b) - row(a) + 1) + col(b) - col(a) + 1
+        """
+        if self._mutation_table is None:
+            h, w = self._shape
+            table = self._build_mutation_rows(np.arange(h * w))
+            table.flags.writeable = False
+            self._mutation_table = table
+            # Indexing bytes is much faster than indexing an array, one cell at a time
+            self._mutation_bytes = table.tobytes()
+            self._middles = [
+                tuple(mr * w + mc for j, (mr, mc) in enumerate(MIDDLE_OFFSETS) if mask >> j & 1)
+                for mask in range(1 << len(MIDDLE_OFFSETS))
+            ]
+        return self._mutation_table
+
+    def _build_mutation_rows(self, cells: np.ndarray) -> np.ndarray:
+        """Build the mutation table's rows for some cell ids"""
+        free = np.pad(self.free_mask(), 1, constant_values=False)
+        rows, cols = np.divmod(cells, self._shape[1])
+        rows += 1
+        cols += 1
+        here = free[rows, cols]
+        table = np.zeros((len(cells), 9), dtype=np.uint8)
+
+        for k, (dr, dc) in enumerate((dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)):
+            for j, (mr, mc) in enumerate(MIDDLE_OFFSETS):
+                # The middle cell must neighbor b, wherever a is
+                if abs(mr - dr) + abs(mc - dc) > 1:
+                    continue
+                ok = free[rows + mr, cols + mc] & here
+                table[:, k] |= ok.astype(np.uint8) << j
+        return table
+
+    def mutation_middles(self, a: int, b: int) -> Tuple[int, ...]:
+        """Get the cells a path can pass through between cells a and b
+
+        :param int a: The cell id of the previous point
+        :param int b: The cell id of the next point
+        :rtype: Tuple[int, ...]
+        :returns: Cell ids, empty if a and b are more than one step apart
+        """
+        w = self._shape[1]
+        dr = b // w - a // w
+        dc = b % w - a % w
+        if dr < -1 or dr > 1 or dc < -1 or dc > 1:
+            return ()
+        if self._mutation_table is None:
+            self.mutation_table()
+        mask = self._mutation_bytes[9 * a + 3 * dr + dc + 4]
+        return tuple(a + d for d in self._middles[mask])
+
+    @property
+    def hash(self) -> str:
+        """A hex digest identifying the warehouse's layout and bases"""
+        if self._hash is None:
+            h = hashlib.sha1()
+            h.update(np.asarray(self._shape, dtype=np.int64).tobytes())
+            h.update(np.packbits(self.free_mask()).tobytes())
+            h.update(np.asarray(self.bases, dtype=np.int64).tobytes())
+            self._hash = h.hexdigest()
+        return self._hash
+
+    def _cache_file(self, name: str) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, self.hash, f"{name}.npy")
+
+    def _load_cached(self, name: str) -> Optional[np.ndarray]:
+        path = self._cache_file(name)
+        if path is None or not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode="r")
+
+    def _save_cached(self, name: str, array: np.ndarray) -> None:
+        path = self._cache_file(name)
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so concurrent runs never read half a file
+            tmp = f"{path}.{os.getpid()}.tmp.npy"
+            np.save(tmp, array)
+            os.replace(tmp, path)
+
+    def _free_cell_graph(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Index the free cells and their free 4-connected neighbors
+
+        :returns:
+            * The cell id of each free cell
+            * For every cell id, its index among the free cells, or -1
+            * A (free cells, 4) array of neighbor indices, -1 where blocked
+        """
+        free = self.free_mask()
+        h, w = free.shape
+        cells = np.flatnonzero(free)
+        index = np.full(h * w, -1, dtype=np.int64)
+        index[cells] = np.arange(len(cells))
+
+        rows, cols = np.divmod(cells, w)
+        neighbors = np.full((len(cells), 4), -1, dtype=np.int64)
+        for k, (dx, dy) in enumerate(((1, 0), (-1, 0), (0, 1), (0, -1))):
+            x = rows + dx
+            y = cols + dy
+            ok = (x >= 0) & (x < h) & (y >= 0) & (y < w)
+            neighbors[ok, k] = index[x[ok] * w + y[ok]]
+
+        return cells, index, neighbors
+
+    def _bfs(self, sources: np.ndarray, neighbors: np.ndarray) -> np.ndarray:
+        """Breadth first search from many sources at once
+
+        :param np.ndarray sources: Free cell indices to search from
+        :param np.ndarray neighbors: The neighbor table from _free_cell_graph
+
+        :rtype: np.ndarray
+        :returns: A (sources, free cells) int32 array of step counts, -1 if unreachable
+        """
+        n = len(neighbors)
+        dist = np.full((len(sources), n), -1, dtype=np.int32)
+        flat = dist.reshape(-1)
+        frontier_src = np.arange(len(sources), dtype=np.int64)
+        frontier = np.asarray(sources, dtype=np.int64)
+        flat[frontier_src * n + frontier] = 0
+
+        steps = 0
+        while len(frontier):
+            steps += 1
+            src = np.repeat(frontier_src, 4)
+            nxt = neighbors[frontier].ravel()
+            ok = nxt >= 0
+            pairs = src[ok] * n + nxt[ok]
+            pairs = pairs[flat[pairs] == -1]
+
+            # Several frontier cells can reach the same cell. Let each
+            # candidate write its (negative) position, and keep only the
+            # one that was written last, to avoid sorting.
+            claims = -2 - np.arange(len(pairs), dtype=np.int32)
+            flat[pairs] = claims
+            pairs = pairs[flat[pairs] == claims]
+
+            flat[pairs] = steps
+            frontier_src, frontier = np.divmod(pairs, n)
+
+        return dist
+
+    def distance_field(self, source: Tuple[int, int], metric: str = "geodesic") -> np.ndarray:
+        """Get (and cache) the distance from a cell to every cell
+
+        :param Tuple[int, int] source: The cell to measure from, usually a base
+        :param str metric: "geodesic" counts the steps a robot needs,
+            going around walls; unreachable and occupied cells are -1.
+            "euclidean" is the straight line distance, computed exactly
+            as Path.euclidean_dist does.
+
+        :rtype: np.ndarray
+        :returns: A read only (rows, columns) array
+        """
+        key = (metric, tuple(source))
+        if key in self._distance_fields:
+            return self._distance_fields[key]
+
+        name = f"{metric}_{source[0]}_{source[1]}"
+        field = self._load_cached(name)
+        if field is None:
+            if metric == "geodesic":
+                cells, index, neighbors = self._free_cell_graph()
+                field = np.full(self._shape, -1, dtype=np.int32)
+                start = index[source[0] * self._shape[1] + source[1]]
+                if start >= 0:
+                    field.flat[cells] = self._bfs(np.array([start]), neighbors)[0]
+            elif metric == "euclidean":
+                rows, cols = np.indices(self._shape)
+                squared = (rows - source[0]) ** 2 + (cols - source[1]) ** 2
+                # `** 0.5` on python ints does not always round like np.sqrt
+                values, inverse = np.unique(squared, return_inverse=True)
+                roots = np.array([int(v) ** 0.5 for v in values], dtype=np.float64)
+                field = roots[inverse.reshape(self._shape)]
+            else:
+                raise ValueError(f"Unknown distance metric: {metric}. Expected geodesic or euclidean")
+            self._save_cached(name, field)
+
+        field = np.asarray(field)
+        field.flags.writeable = False
+        self._distance_fields[key] = field
+        return field
+
+    def all_pairs_distances(self, max_cells: int = 4096) -> np.ndarray:
+        """Get (and cache) the geodesic distance between every pair of free cells
+
+        Only available on small warehouses, as memory grows with the
+        square of the number of free cells. Use free_cell_index() to
+        convert cell ids into rows and columns of the result.
+
+        :param int max_cells: Refuse to build the table for more free cells than this
+
+        :rtype: np.ndarray
+        :returns: A read only (free cells, free cells) int32 array, -1 if unreachable
+        """
+        if self._all_pairs is None:
+            table = self._load_cached("all_pairs")
+            if table is None:
+                cells, index, neighbors = self._free_cell_graph()
+                if len(cells) > max_cells:
+                    raise ValueError(
+                        f"Warehouse has {len(cells)} free cells, all pairs distances are limited to {max_cells}"
+                    )
+                table = self._bfs(np.arange(len(cells)), neighbors)
+                self._save_cached("all_pairs", table)
+            table = np.asarray(table)
+            table.flags.writeable = False
+            self._all_pairs = table
+        return self._all_pairs
+
+    def free_cell_index(self) -> np.ndarray:
+        """For every cell id, its index among the free cells, or -1 if occupied"""
+        return self._free_cell_graph()[1]
+
+
+def pad_rows(rows: List[List[bool]]) -> np.ndarray:
+    """Stack rows of different lengths into a bool array, padding short
+    rows with occupied space
+    """
+    width = max((len(row) for row in rows), default=0)
+    out = np.ones((len(rows), width), dtype=bool)
+    for i, row in enumerate(rows):
+        out[i, :len(row)] = row
+    return out
+
+
+def bresenham(start: Tuple[int, int], end: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Get the grid cells on the line between two points, endpoints included"""
+    x0, y0 = start
+    x1, y1 = end
+    dx = abs(x1 - x0)
+    dy = -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy
 
+    out = [(x0, y0)]
+    while (x0, y0) != (x1, y1):
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x0 += sx
+        if e2 <= dx:
+            err += dx
+            y0 += sy
+        out.append((x0, y0))
+    return out
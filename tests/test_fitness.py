@@ -0,0 +1,131 @@
+# Base python imports
+import random
+
+# Extended python imports
+import numpy as np
+import pytest
+
+# Project imports
+from benchmark import legacy_distance_score, legacy_path_fitness, legacy_surveillance_score, random_solution
+from conftest import bundled
+from fitness import IncrementalFitness, IncrementalPathFitness, windowed_scores
+from path import Path
+from solution import Solution
+from utils import Warehouse
+
+WAREHOUSES = ["warehouse.txt", "warehouse1.txt", "bigWarehouse.txt", "warehouse.png"]
+
+
+@pytest.fixture(scope="module", params=WAREHOUSES)
+def warehouse(request):
+    return Warehouse(bundled(request.param))
+
+
+@pytest.mark.parametrize("vision_radius", [1, 2])
+def test_solution_fitness_matches_original(warehouse, vision_radius):
+    """The vectorized scorer gives exactly the original loop's fitness"""
+    random.seed(0)
+    for _ in range(4):
+        solution = random_solution(warehouse, 40, 4, 40)
+        for p in solution.paths:
+            p.vision_radius = vision_radius
+        expected = legacy_surveillance_score(solution) + legacy_distance_score(solution)
+        assert solution.fitness_func() == expected
+
+
+@pytest.mark.parametrize("distance_multiplier", [1, 0.25])
+def test_path_fitness_matches_original(warehouse, distance_multiplier):
+    """A single path's cached lookups give exactly the original loop's fitness"""
+    random.seed(1)
+    for base in warehouse.bases[:4]:
+        path = Path(warehouse, base, battery_life=40)
+        for _ in range(40):
+            path.mutate()
+        path.distance_multiplier = distance_multiplier
+        assert path.fitness_func() == legacy_path_fitness(path)
+
+
+def test_incremental_fitness_tracks_rescoring(warehouse):
+    """After every mutation, delta() predicts the rescored fitness, and
+    update() or undoing the move keeps the tracked score exact"""
+    random.seed(2)
+    solution = random_solution(warehouse, 40, 4, 40)
+    scorer = IncrementalFitness(solution.paths)
+    assert scorer.score == pytest.approx(solution.fitness_func(), rel=1e-12)
+
+    for _ in range(200):
+        robot = random.randrange(len(solution.paths))
+        before = solution.fitness_func()
+        index, old, new = solution.paths[robot].mutate()
+        delta = scorer.delta(robot, index, old, new)
+        after = solution.fitness_func()
+        assert before + delta == pytest.approx(after, rel=1e-12)
+
+        if random.random() < 0.5:
+            # Rounding is relative to the score, not to the change
+            assert scorer.update(robot, index, old, new) == pytest.approx(delta, abs=1e-12 * after)
+            assert scorer.score == pytest.approx(after, rel=1e-12)
+        else:
+            solution.paths[robot].coord_list[index] = old
+            assert scorer.score == pytest.approx(before, rel=1e-12)
+
+
+def test_incremental_path_fitness_tracks_rescoring(warehouse):
+    """The same for a single path, with the distance multiplier changing
+    between moves"""
+    random.seed(3)
+    path = Path(warehouse, warehouse.bases[0], battery_life=40)
+    scorer = IncrementalPathFitness(path)
+
+    for _ in range(200):
+        path.distance_multiplier = random.choice([1, 0.5, 2.25])
+        before = path.fitness_func()
+        assert scorer.score == pytest.approx(before, rel=1e-12)
+        index, old, new = path.mutate()
+        delta = scorer.delta(0, index, old, new)
+        after = path.fitness_func()
+        assert before + delta == pytest.approx(after, rel=1e-12)
+
+        if random.random() < 0.5:
+            assert scorer.update(0, index, old, new) == pytest.approx(delta, abs=1e-12 * after)
+            assert scorer.score == pytest.approx(after, rel=1e-12)
+        else:
+            path.coord_list[index] = old
+            assert scorer.score == pytest.approx(before, rel=1e-12)
+
+
+@pytest.fixture(scope="module")
+def ragged_population(warehouse):
+    """Solutions whose robots have different battery lives"""
+    random.seed(4)
+    batteries = [7, 12, 20, 9]
+    solutions = []
+    for _ in range(3):
+        paths = []
+        for r, battery in enumerate(batteries):
+            path = Path(warehouse, warehouse.bases[r % len(warehouse.bases)], battery_life=battery)
+            for _ in range(battery):
+                path.mutate()
+            paths.append(path)
+        solutions.append(Solution(paths))
+    return solutions
+
+
+@pytest.mark.parametrize("window", [1, 2, 5, 19, 20, 64])
+def test_windowed_scores_match_whole_horizon(warehouse, ragged_population, window):
+    """Scoring in windows of any size, including one timestep and more
+    than the longest battery, gives the same scores as a single window"""
+    cells = [[p.cells for p in s.paths] for s in ragged_population]
+    bases = [p.base for p in ragged_population[0].paths]
+
+    expected = windowed_scores(warehouse, cells, bases, window=20)
+    actual = windowed_scores(warehouse, cells, bases, window=window)
+    np.testing.assert_array_equal(actual[0], expected[0])
+    np.testing.assert_array_equal(actual[1], expected[1])
+    np.testing.assert_array_equal(actual[2].cells, expected[2].cells)
+    np.testing.assert_array_equal(actual[2].staleness, expected[2].staleness)
+    # Each robot's distances are summed window by window
+    np.testing.assert_allclose(actual[2].distance, expected[2].distance, rtol=1e-12)
+
+    for s, surveillance, distance in zip(ragged_population, *actual[:2]):
+        assert surveillance + distance == s.fitness_func()
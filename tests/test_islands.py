@@ -0,0 +1,16 @@
+# Extended python imports
+import pytest
+
+# Project imports
+from conftest import bundled
+from islands import run_islands
+from utils import Warehouse
+
+
+def test_failed_island_stops_the_run():
+    """An island that raises stops the others, which would otherwise wait
+    forever for its migrants, and its error reaches the caller"""
+    w = Warehouse(bundled("warehouse.txt"))
+    # Every island divides by the migration interval
+    with pytest.raises(RuntimeError, match="ZeroDivisionError"):
+        run_islands(w, 30, islands=2, population=4, cycles=5, migration_interval=0)
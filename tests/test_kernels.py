@@ -0,0 +1,69 @@
+# Base python imports
+import random
+
+# Extended python imports
+import numpy as np
+import pytest
+
+# Project imports
+from conftest import bundled
+from path import Path
+from utils import Warehouse
+import kernels
+
+# Skips this module when Numba can't be imported
+kernels_numba = pytest.importorskip("kernels_numba")
+
+WAREHOUSES = ["warehouse.txt", "warehouse1.txt", "bigWarehouse.txt", "warehouse.png"]
+
+
+@pytest.fixture(scope="module", params=WAREHOUSES)
+def population(request):
+    """A warehouse, and a (solutions, robots, timesteps) array of mutated paths in it"""
+    random.seed(0)
+    rng = np.random.default_rng(0)
+    w = Warehouse(bundled(request.param))
+    solutions = []
+    for s in range(3):
+        paths = []
+        for r in range(5):
+            path = Path(w, w.bases[(s + r) % len(w.bases)], battery_life=40)
+            for _ in range(int(rng.integers(0, 40))):
+                if len(path.movable_indices()):
+                    path.mutate()
+            paths.append(path.cells)
+        solutions.append(np.stack(paths))
+    return w, np.stack(solutions)
+
+
+@pytest.mark.parametrize("vision_radius", [1, 2])
+@pytest.mark.parametrize("line_of_sight", [False, True])
+def test_last_seen(population, vision_radius, line_of_sight):
+    w, cells = population
+    table = w.visibility_table(vision_radius, line_of_sight)
+    size = w.shape[0] * w.shape[1]
+    np.testing.assert_array_equal(
+        kernels_numba.last_seen_numba(table, cells, size),
+        kernels.last_seen_numpy(table, cells, size),
+    )
+
+
+@pytest.mark.parametrize("vision_radius", [1, 2])
+@pytest.mark.parametrize("line_of_sight", [False, True])
+def test_last_seen_by(population, vision_radius, line_of_sight):
+    w, cells = population
+    table = w.visibility_table(vision_radius, line_of_sight)
+    size = w.shape[0] * w.shape[1]
+    np.testing.assert_array_equal(
+        kernels_numba.last_seen_by_numba(table, cells, size),
+        kernels.last_seen_by_numpy(table, cells, size),
+    )
+
+
+def test_mutation_indices(population):
+    w, cells = population
+    for path in cells.reshape(-1, cells.shape[-1]):
+        np.testing.assert_array_equal(
+            kernels_numba.mutation_indices_numba(path, w.shape[1]),
+            kernels.mutation_indices_numpy(path, w.shape[1]),
+        )
@@ -0,0 +1,54 @@
+# Base python imports
+import random
+
+# Project imports
+from conftest import bundled
+from evolution import breed, rank
+from main import generation_factory
+from operators import CoverageCrossover
+from utils import Warehouse
+
+
+def test_coverage_crossover_mixes_parents():
+    """On a map with several robots, children should often take paths
+    from both parents, rather than copying one of them"""
+    random.seed(0)
+    w = Warehouse(bundled("warehouse.txt"))
+    assert len(w.bases) > 1
+    crossover = CoverageCrossover()
+
+    gen = generation_factory(w, 30, 12)
+    known = mixed = 0
+    for _ in range(30):
+        rank(gen)
+        for u in range(len(gen.solutions)):
+            for v in range(len(gen.solutions)):
+                if u == v:
+                    continue
+                crossover._remember(gen.solutions[u])
+                crossover._remember(gen.solutions[v])
+                take = crossover.choose(gen.solutions[u], gen.solutions[v])
+                if take:
+                    known += 1
+                    mixed += any(take) and not all(take)
+        gen = breed(gen, crossover=crossover)
+
+    assert known > 0
+    assert mixed / known > 0.2
+
+
+def test_coverage_crossover_keeps_paths():
+    """Crossing over swaps paths between the two solutions, so no path
+    is lost or duplicated"""
+    random.seed(1)
+    w = Warehouse(bundled("warehouse.txt"))
+    crossover = CoverageCrossover()
+    gen = generation_factory(w, 30, 4)
+    rank(gen)
+
+    before = sorted(id(p) for s in gen.solutions[:2] for p in s.paths)
+    crossover(gen, 0, 1)
+    after = sorted(id(p) for s in gen.solutions[:2] for p in s.paths)
+    assert before == after
+    for robot in range(len(w.bases)):
+        assert {gen.solutions[0].paths[robot].base, gen.solutions[1].paths[robot].base} == {w.bases[robot]}